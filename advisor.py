@@ -0,0 +1,166 @@
+import itertools
+import math
+from array import array
+from collections import Counter
+from functools import lru_cache
+
+import dice
+from engine import GameState
+from hints import cell_hints
+
+# ----------------- Reroll advisor ---------------------------
+#
+# Which dice to keep so the final roll claims the best free tile. A final
+# roll is worth the best weight among the tiles it fits; with n rerolls left
+# a roll is worth the best keep's expected value over the dice rerolled:
+#
+#     V(roll, 0) = max weight of the free tiles roll fits
+#     V(roll, n) = max over keep of E[V(keep + new dice, n - 1)]
+#
+# Only 462 keeps (multisets of 0-5 dice) and 252 rolls exist, so the DP is
+# a few thousand multiply-adds per level. A board enters only through one
+# weight per rule key, and solutions are cached on those weights. Every
+# table in the process shares the cache, so repeated advice is a lookup.
+
+WIN_WEIGHT = 100  # the tile completes our line
+BLOCK_WEIGHT = 50  # the tile stops the opponent completing theirs
+
+
+class Advice:
+    __slots__ = ("keep", "expected", "hit_chance")
+
+    def __init__(self, keep: tuple, expected: float, hit_chance: float):
+        self.keep = keep  # dice to hold, sorted
+        self.expected = expected  # expected weight of the tile finally claimed
+        self.hit_chance = hit_chance  # chance the final roll fits any free tile
+
+    def __repr__(self):
+        return (
+            f"Advice(keep={self.keep}, expected={self.expected:.2f}, "
+            f"hit_chance={self.hit_chance:.2f})"
+        )
+
+
+# ----------------- Dice model -------------------------------
+
+
+def _sub_multisets(roll):
+    counts = sorted(Counter(roll).items())
+    subs = [()]
+    for face, n in counts:
+        subs = [s + (face,) * k for s in subs for k in range(n + 1)]
+    return [tuple(sorted(s)) for s in subs]
+
+
+def _outcomes(m: int):
+    """(multiset of m dice, probability) for every distinct result."""
+    result = []
+    for faces in itertools.combinations_with_replacement(range(1, dice.FACES + 1), m):
+        ways = math.factorial(m)
+        for n in Counter(faces).values():
+            ways //= math.factorial(n)
+        result.append((faces, ways / dice.FACES**m))
+    return result
+
+
+class _Model:
+    """Rule-independent structure of the DP, built once."""
+
+    def __init__(self):
+        self.rolls = list(dice.all_rolls())
+        roll_index = {r: i for i, r in enumerate(self.rolls)}
+        self.keeps = [k for m in range(dice.DICE + 1) for k, _ in _outcomes(m)]
+        keep_index = {k: i for i, k in enumerate(self.keeps)}
+        outcomes = {m: _outcomes(m) for m in range(dice.DICE + 1)}
+        # keep -> [(final roll index, probability)]
+        self.transitions = [
+            [
+                (roll_index[tuple(sorted(keep + new))], p)
+                for new, p in outcomes[dice.DICE - len(keep)]
+            ]
+            for keep in self.keeps
+        ]
+        # roll -> indices of the keeps it allows
+        self.choices = [[keep_index[s] for s in _sub_multisets(r)] for r in self.rolls]
+        self.roll_index = roll_index
+
+
+_model = None
+
+
+def model() -> _Model:
+    global _model
+    if _model is None:
+        _model = _Model()
+    return _model
+
+
+# ----------------- DP ---------------------------------------
+
+
+@lru_cache(maxsize=1024)  # about 15 KB per entry
+def _solve(keys: tuple, weights: tuple, floor: int, rerolls: int):
+    """Per level, per roll: (value, hit chance, best keep index)."""
+    m = model()
+    table = dice.table_for(keys)
+    weighted = [(table.bits[k], w) for k, w in zip(keys, weights) if w and k in table.bits]
+    value = []
+    for r in m.rolls:
+        mask = table.masks[r]
+        value.append(max([w for bit, w in weighted if mask & bit], default=floor))
+    hit = [1.0 if v > 0 else 0.0 for v in value]
+    levels = [(value, hit, None)]
+    for _ in range(rerolls):
+        keep_value = [sum(p * value[i] for i, p in t) for t in m.transitions]
+        keep_hit = [sum(p * hit[i] for i, p in t) for t in m.transitions]
+        best = [
+            max(choices, key=lambda k: (keep_value[k], keep_hit[k], len(m.keeps[k])))
+            for choices in m.choices
+        ]
+        value = [keep_value[k] for k in best]
+        hit = [keep_hit[k] for k in best]
+        levels.append((value, hit, best))
+    # compact arrays, as the cache keeps them
+    return [
+        (array("d", v), array("d", h), None if b is None else array("H", b))
+        for v, h, b in levels
+    ]
+
+
+def best_keep(roll, rerolls: int, keys, weights, floor: int = 0) -> Advice:
+    """Advice for a roll given one weight per rule key (0: no free tile)."""
+    roll = tuple(sorted(roll))
+    levels = _solve(tuple(keys), tuple(weights), floor, rerolls)
+    value, hit, best = levels[rerolls]
+    i = model().roll_index[roll]
+    keep = roll if best is None else model().keeps[best[i]]
+    return Advice(keep, value[i], hit[i])
+
+
+def tile_weights(game: GameState):
+    """(rule keys, weight per key, floor) for the player to move.
+
+    A tile weighs its hint gain, or WIN_WEIGHT / BLOCK_WEIGHT for a line;
+    a key weighs its best free tile. Tiles without a dice rule can always be
+    claimed and set the floor.
+    """
+    keys = tuple(game.values)
+    table = dice.table_for(game.values)
+    best = {}
+    floor = 0
+    for (r, c), hint in cell_hints(game).items():
+        weight = WIN_WEIGHT if hint.wins else BLOCK_WEIGHT if hint.blocks_win else max(hint.gain, 1)
+        key = game.grid[r][c]
+        if key in table.bits:
+            best[key] = max(best.get(key, 0), weight)
+        else:
+            floor = max(floor, weight)
+    return keys, tuple(best.get(k, 0) for k in keys), floor
+
+
+def advise(game: GameState) -> Advice | None:
+    """Which dice to keep for the current roll, or None without a reroll to make."""
+    if game.roll is None or game.rerolls_left <= 0 or game.game_over:
+        return None
+    keys, weights, floor = tile_weights(game)
+    return best_keep(game.roll, game.rerolls_left, keys, weights, floor)
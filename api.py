@@ -0,0 +1,106 @@
+from engine import GameState
+
+# ----------------- Headless game API ------------------------
+#
+# Plain-data helpers for the JSON API in app.py: a game's state as a dict,
+# and a batch of moves applied in one go. Nothing here touches NiceGUI.
+#
+# A move is {"op": "play", "row": r, "col": c}, {"op": "pass"} or
+# {"op": "undo"}; the short list forms ["play", r, c], ["pass"] and
+# ["undo"] are accepted too.
+
+MAX_BATCH = 1000
+MAX_SIDE = 8  # rows or cols of a new game
+
+
+class MoveError(ValueError):
+    """A batch that cannot be applied; nothing was played."""
+
+
+def state_json(game: GameState) -> dict:
+    p1, p2 = game.scores()
+    return {
+        "rows": game.rows,
+        "cols": game.cols,
+        "grid": game.grid,
+        "owner": game.owner,
+        "player": game.player,
+        "roll": game.roll,
+        "rerolls_left": game.rerolls_left if game.roll else 0,
+        "scores": {"Player 1": p1, "Player 2": p2},
+        "rounds": dict(game.rounds),
+        "pending_last_turn_for": game.pending_last_turn_for,
+        "game_over": game.game_over,
+        "winner": game.winner,
+        "win_reason": game.win_reason,
+        "moves": len(game.history),
+    }
+
+
+def board_size(data: dict, rows: int, cols: int) -> tuple:
+    """(rows, cols) asked for in a new-game body, defaulting to the given size."""
+    size = (data.get("rows", rows), data.get("cols", cols))
+    if not all(isinstance(n, int) and 2 <= n <= MAX_SIDE for n in size):
+        raise ValueError(f"rows and cols must be integers from 2 to {MAX_SIDE}")
+    return size
+
+
+def parse_seed(data: dict):
+    """The optional board seed of a new-game body; it is stored as 64 unsigned bits."""
+    seed = data.get("seed")
+    if seed is not None and (
+        isinstance(seed, bool) or not isinstance(seed, int) or not 0 <= seed < 2**64
+    ):
+        raise ValueError("seed must be an integer from 0 to 2**64 - 1")
+    return seed
+
+
+def parse_moves(moves, rows: int, cols: int) -> list:
+    """Validate a batch up front, so a bad move never half-applies it."""
+    if not isinstance(moves, list):
+        raise MoveError("moves must be a list")
+    if len(moves) > MAX_BATCH:
+        raise MoveError(f"at most {MAX_BATCH} moves per request")
+    parsed = []
+    for i, move in enumerate(moves):
+        if isinstance(move, dict):
+            op, row, col = move.get("op"), move.get("row"), move.get("col")
+        elif isinstance(move, list) and move:
+            op, row, col = (move + [None, None])[:3]
+        else:
+            raise MoveError(f"move {i}: expected an object or a list")
+        if op == "play":
+            if not (
+                isinstance(row, int) and isinstance(col, int)
+                and 0 <= row < rows and 0 <= col < cols
+            ):
+                raise MoveError(f"move {i}: play needs row and col on the board")
+            parsed.append((op, row, col))
+        elif op in ("pass", "undo"):
+            parsed.append((op, None, None))
+        else:
+            raise MoveError(f"move {i}: unknown op {op!r}")
+    return parsed
+
+
+def apply_moves(game: GameState, moves) -> list:
+    """Apply parsed moves in order; one result string per move.
+
+    play returns what GameState.play does ("placed", "removed" or
+    "blocked"); pass gives "passed" or "blocked"; undo gives "undone" or
+    "nothing".
+    """
+    results = []
+    for op, row, col in moves:
+        if op == "play":
+            results.append(game.play(row, col))
+        elif op == "pass":
+            before = len(game.history)
+            game.pass_turn()
+            results.append("passed" if len(game.history) > before else "blocked")
+        elif game.history:
+            game.undo_last()
+            results.append("undone")
+        else:
+            results.append("nothing")
+    return results
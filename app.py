@@ -1,7 +1,35 @@
-from nicegui import ui
-import random
+from fastapi import Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from nicegui import app, background_tasks, core, run, ui
+import asyncio
+import html
 import json
 import os
+import secrets
+import time
+import uuid
+from functools import lru_cache
+from types import MappingProxyType
+
+import advisor
+import api
+import bot
+import dice
+import checkpoint
+import metrics
+import solver
+from hints import cell_hints
+from bot import position_key
+from engine import (
+    GameState,
+    dice_and_rule_values,
+    dice_string_to_faces,
+    die_face,
+    is_dice_face,
+)
+import gamelog
+from persistence import WriteBehind, write_json_atomic
+from sessions import SessionStore
 
 SETTINGS_FILE = "game_settings.json"
 
@@ -24,7 +52,7 @@ DEFAULT_CONFIG = {
     "board": {
         "rows": 4,
         "cols": 4,
-        "cell_size": "min(22vw, 22vh)",
+        "cell_size": "auto",
     },
 }
 
@@ -40,707 +68,1375 @@ def _merge_config(data: dict, base: dict) -> dict:
     return result
 
 
-def load_config() -> dict:
-    if not os.path.exists(SETTINGS_FILE):
+def load_config(path: str = SETTINGS_FILE) -> dict:
+    if not os.path.exists(path):
         return dict(DEFAULT_CONFIG)
     try:
-        with open(SETTINGS_FILE, "r", encoding="utf-8") as f:
+        with open(path, "r", encoding="utf-8") as f:
             raw = json.load(f)
     except Exception:
         return dict(DEFAULT_CONFIG)
     return _merge_config(raw, DEFAULT_CONFIG)
 
 
-def save_config(cfg: dict) -> None:
-    try:
-        with open(SETTINGS_FILE, "w", encoding="utf-8") as f:
-            json.dump(cfg, f, ensure_ascii=False, indent=2)
-    except Exception:
-        pass
+def save_config(cfg: dict, path: str = SETTINGS_FILE) -> None:
+    """Write the config right away; UI handlers use Server.update_settings instead."""
+    write_json_atomic(path, cfg)
 
 
-config = load_config()
+class Settings:
+    """Immutable snapshot of the config, read once at startup.
 
-# expose board globals for helper functions
-rows = config["board"]["rows"]
-cols = config["board"]["cols"]
-cell_size = config["board"]["cell_size"]
+    A preference change makes a new snapshot with replace(); tables already
+    open keep the names, colors and fonts they were created with.
+    """
 
-# ----------------- Game logic constants ---------------------
-
-# dice-face unicode mapping
-die_face = {
-    "1": "\u2680",
-    "2": "\u2681",
-    "3": "\u2682",
-    "4": "\u2683",
-    "5": "\u2684",
-    "6": "\u2685",
-}
+    __slots__ = (
+        "player_names",
+        "player_colors",
+        "tile_colors",
+        "palette",
+        "fonts",
+        "rows",
+        "cols",
+        "cell_size",
+    )
 
-# scoring/rules
-dice_and_rule_values = {
-    # Pairs
-    "1 1": 1,
-    "2 2": 1,
-    "3 3": 1,
-    "4 4": 1,
-    "5 5": 1,
-    "6 6": 1,
-    # Triplets
-    "1 1 1": 1,
-    "2 2 2": 1,
-    "3 3 3": 1,
-    "4 4 4": 1,
-    "5 5 5": 1,
-    "6 6 6": 1,
-    # Specials
-    "<= 9": 2,
-    ">= 26": 2,
-    "12 / 13 / 14": 2,
-    "21 / 22 / 23": 2,
-    "A A  B B": 2,
-    "A A A  B B": 3,
-    "A A A A": 3,
-    "A A A A A": 4,
-    "A B C D E": 3,
-    "A +1 +2 +3": 2,
-    "A +1 +2 +3 +4": 3,
-    "1, 3, 5": 2,
-    "2, 4, 6": 2,
-}
+    def __init__(self, cfg: dict):
+        cfg = _merge_config(cfg, DEFAULT_CONFIG)
+        tile_colors = cfg["tile_colors"]
+        for name, v in (
+            ("player_names", MappingProxyType(dict(cfg["player_names"]))),
+            ("player_colors", MappingProxyType(dict(cfg["player_colors"]))),
+            ("tile_colors", MappingProxyType(dict(tile_colors))),
+            # hashable, so tile_info() can cache on it
+            ("palette", (tile_colors["pair"], tile_colors["triple"], tile_colors["other"])),
+            ("fonts", MappingProxyType(dict(cfg["fonts"]))),
+            ("rows", int(cfg["board"]["rows"])),
+            ("cols", int(cfg["board"]["cols"])),
+            ("cell_size", cfg["board"]["cell_size"]),
+        ):
+            object.__setattr__(self, name, v)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Settings is immutable")
+
+    @classmethod
+    def load(cls, path: str = SETTINGS_FILE) -> "Settings":
+        return cls(load_config(path))
+
+    def to_dict(self) -> dict:
+        return {
+            "player_names": dict(self.player_names),
+            "player_colors": dict(self.player_colors),
+            "tile_colors": dict(self.tile_colors),
+            "fonts": dict(self.fonts),
+            "board": {"rows": self.rows, "cols": self.cols, "cell_size": self.cell_size},
+        }
+
+    def replace(self, section: str, key: str, value) -> "Settings":
+        """A copy with config[section][key] set to value."""
+        cfg = self.to_dict()
+        cfg[section][key] = value
+        return Settings(cfg)
+
+    def cell_css(self, rows: int, cols: int) -> str:
+        """CSS size of a board cell; boards of any size can share one server."""
+        if self.cell_size != "auto":
+            return self.cell_size
+        # 4x4 gets min(22vw, 22vh); bigger boards shrink to fit the screen
+        return f"min({88 / cols:g}vw, {88 / rows:g}vh)"
 
-possible_values = list(dice_and_rule_values.keys())
 
 # ----------------- Helper functions -------------------------
 
 
-def is_dice_face(value: str) -> bool:
-    return all(part.isdigit() for part in value.split())
-
-
-def dice_string_to_faces(s: str) -> str:
-    return " ".join(die_face[n] for n in s.split()) if is_dice_face(s) else s
-
-
-def card_bg_color(value: str) -> str:
-    colors = config["tile_colors"]
+def card_bg_color(value: str, palette: tuple) -> str:
+    """Tile background from a Settings.palette of (pair, triple, other)."""
+    pair, triple, other = palette
     if is_dice_face(value):
         parts = value.split()
         if len(parts) == 2:
-            return colors["pair"]
+            return pair
         elif len(parts) == 3:
-            return colors["triple"]
-    return colors["other"]
+            return triple
+    return other
+
+
+# ----------------- Tile render model ------------------------
+#
+# Everything a tile needs for display is worked out once per tile text
+# and palette (TileInfo) and once per font/badge setting (TileStyles), so rendering a
+# board is lookups and string concatenation only.
+
+
+class TileInfo:
+    """Immutable display data for one tile text in one palette."""
+
+    __slots__ = ("text", "glyphs", "html_glyphs", "is_dice", "points", "color")
+
+    def __init__(self, text: str, palette: tuple):
+        value = text.strip()
+        glyphs = dice_string_to_faces(value)
+        for name, v in (
+            ("text", value),
+            ("glyphs", glyphs),
+            ("html_glyphs", html.escape(glyphs)),
+            ("is_dice", is_dice_face(value)),
+            ("points", dice_and_rule_values.get(value, 0)),
+            ("color", card_bg_color(value, palette)),
+        ):
+            object.__setattr__(self, name, v)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("TileInfo is immutable")
+
+
+@lru_cache(maxsize=None)
+def tile_info(text: str, palette: tuple) -> TileInfo:
+    return TileInfo(text, palette)
+
+
+class TileStyles:
+    """Inline styles of a board tile for one set of font/badge scales."""
+
+    __slots__ = (
+        "dice_fs",
+        "text_fs",
+        "badge_size",
+        "pts_fs",
+        "tile_rest",
+        "dice_label",
+        "text_label",
+        "badge",
+        "badge_label",
+        "hint",
+        "cell_size",
+        "_tile",
+    )
 
+    def __init__(self, dice_font_scale, text_font_scale, badge_scale, badge_text_scale, cell_size):
+        self.dice_fs = f"{1.4 * dice_font_scale}vw"
+        self.text_fs = f"{1.4 * text_font_scale}vw"
+        self.badge_size = f"{2.4 * badge_scale}vw"
+        self.pts_fs = f"{1.4 * badge_text_scale}vw"
+        self.cell_size = cell_size
+        self.tile_rest = (
+            f"; width:{cell_size}; height:{cell_size}; "
+            "border:2px solid white; border-radius:10px; position:relative; cursor:pointer;"
+        )
+        label = "position:absolute; left:10px; top:10px; font-size:{}; font-weight:bold;"
+        self.dice_label = label.format(self.dice_fs)
+        self.text_label = label.format(self.text_fs)
+        self.badge = (
+            f"position:absolute; bottom:10px; right:10px; width:{self.badge_size}; "
+            f"height:{self.badge_size}; background:white; border-radius:50%; "
+            "border:2px solid grey; display:flex;align-items:center;justify-content:center;"
+        )
+        self.badge_label = f"font-size:{self.pts_fs}; font-weight:bold;"
+        self.hint = f"position:absolute; right:10px; top:10px; font-size:{self.text_fs}; font-weight:bold;"
+        self._tile = {}  # background -> full tile style
+
+    def tile(self, bg: str) -> str:
+        style = self._tile.get(bg)
+        if style is None:
+            style = self._tile[bg] = "background:" + bg + self.tile_rest
+        return style
+
+    def label(self, info: TileInfo) -> str:
+        return self.dice_label if info.is_dice else self.text_label
+
+
+@lru_cache(maxsize=64)
+def tile_styles(
+    dice_font_scale, text_font_scale, badge_scale, badge_text_scale, cell_size
+) -> TileStyles:
+    return TileStyles(dice_font_scale, text_font_scale, badge_scale, badge_text_scale, cell_size)
+
+
+def game_tile_styles(game, settings: Settings) -> TileStyles:
+    return tile_styles(
+        game.dice_font_scale,
+        game.text_font_scale,
+        game.badge_scale,
+        game.badge_text_scale,
+        settings.cell_css(game.rows, game.cols),
+    )
 
-def random_grid(values):
-    shuffled = random.sample(values, rows * cols)
-    return [shuffled[i * cols:(i + 1) * cols] for i in range(rows)]
 
+def tile_bg(game, r: int, c: int, palette: tuple) -> str:
+    owner = game.owner[r][c]
+    if owner:
+        return game.player_colors.get(owner) or tile_info(game.grid[r][c], palette).color
+    return tile_info(game.grid[r][c], palette).color
 
-def count_total_points(grid, owner_matrix):
-    score_p1 = score_p2 = 0
-    counted = set()
 
-    for r in range(rows):
-        for c in range(cols):
-            owner = owner_matrix[r][c]
-            if owner is None:
-                continue
-            base = dice_and_rule_values.get(grid[r][c], 0)
-            if owner == "Player 1":
-                score_p1 += base
-            else:
-                score_p2 += base
+# -------------------- Game State ----------------------------
 
-            # adjacency bonus
-            for dr, dc in [(-1, 0), (0, -1), (-1, -1), (-1, 1)]:
-                nr, nc = r + dr, c + dc
-                if 0 <= nr < rows and 0 <= nc < cols and owner_matrix[nr][nc] == owner:
-                    pair = tuple(sorted(((r, c), (nr, nc))))
-                    if pair not in counted:
-                        if owner == "Player 1":
-                            score_p1 += 1
-                        else:
-                            score_p2 += 1
-                        counted.add(pair)
 
-    return score_p1, score_p2
+class UIGameState(GameState):
+    """Engine GameState plus the display settings a table is shown with."""
 
+    def __init__(self, settings: Settings):
+        super().__init__(settings.rows, settings.cols)
 
-def count_tiles(owner_matrix):
-    """Return (tiles_p1, tiles_p2)."""
-    return (
-        sum(cell == "Player 1" for row in owner_matrix for cell in row),
-        sum(cell == "Player 2" for row in owner_matrix for cell in row),
-    )
+        # plain copies, so the game still pickles to worker processes
+        self.player_names = dict(settings.player_names)
+        self.player_colors = dict(settings.player_colors)
+        # tile colors and cell size stay in Settings; pages pass them in
+        self.dice_font_scale = settings.fonts["dice_font_scale"]
+        self.text_font_scale = settings.fonts["text_font_scale"]
+        self.badge_scale = settings.fonts["badge_scale"]
+        self.badge_text_scale = settings.fonts["badge_text_scale"]
 
+        # which player the computer plays, if any
+        self.computer = None
+        self.bot_thinking = False
+        # the finished game is in the game log; checkpointed, so a restart
+        # does not log it again
+        self.logged = False
 
-# -------------------- Game State ----------------------------
-
-
-class GameState:
-    def __init__(self):
-        self.grid = random_grid(possible_values)
-        self.owner = [[None] * cols for _ in range(rows)]
-        self.player = "Player 1"  # whose turn it is
-
-        # rounds per player (turns, including pass)
-        self.rounds = {"Player 1": 0, "Player 2": 0}
-
-        # game-end state
-        self.game_over = False
-        self.winner = None  # "Player 1", "Player 2", or None for tie
-        self.win_reason = ""
-        self.pending_last_turn_for = None  # who still gets a last turn due to 21+ rule
-
-        # history stack for undo
-        self.history: list[dict] = []
-
-        # settings from config
-        self.player_names = dict(config["player_names"])
-        self.player_colors = dict(config["player_colors"])
-        # tile colors stay in config; we just read from there for backgrounds
-        self.dice_font_scale = config["fonts"]["dice_font_scale"]
-        self.text_font_scale = config["fonts"]["text_font_scale"]
-        self.badge_scale = config["fonts"]["badge_scale"]
-        self.badge_text_scale = config["fonts"]["badge_text_scale"]
-
-    # ---- core operations ----
-
-    def reset_board(self):
-        self.grid = random_grid(possible_values)
-        self.owner = [[None] * cols for _ in range(rows)]
-        self.player = "Player 1"
-        self.rounds = {"Player 1": 0, "Player 2": 0}
-        self.game_over = False
-        self.winner = None
-        self.win_reason = ""
-        self.pending_last_turn_for = None
-        self.history.clear()
-
-    def _save_snapshot(self):
-        """Save current state so we can undo the last full turn."""
-        self.history.append(
-            {
-                "owner": [row[:] for row in self.owner],
-                "rounds": dict(self.rounds),
-                "player": self.player,
-                "game_over": self.game_over,
-                "winner": self.winner,
-                "win_reason": self.win_reason,
-                "pending_last_turn_for": self.pending_last_turn_for,
-            }
-        )
+    def reset_board(self, seed=None):
+        super().reset_board(seed)
+        self.logged = False
 
     def undo_last(self):
-        """Undo the last completed turn (place or pass)."""
-        if not self.history:
-            return
-        snap = self.history.pop()
-        self.owner = [row[:] for row in snap["owner"]]
-        self.rounds = dict(snap["rounds"])
-        self.player = snap["player"]
-        self.game_over = snap["game_over"]
-        self.winner = snap["winner"]
-        self.win_reason = snap["win_reason"]
-        self.pending_last_turn_for = snap["pending_last_turn_for"]
-
-    def _has_four_in_line(self, player: str) -> bool:
-        directions = [(1, 0), (0, 1), (1, 1), (1, -1)]
-        for r in range(rows):
-            for c in range(cols):
-                if self.owner[r][c] != player:
-                    continue
-                for k in range(1, 4):  # need 3 more = total 4
-                    nr, nc = r + directions[0][0] * 0, c + directions[0][1] * 0
-                for dr, dc in directions:
-                    ok = True
-                    for k in range(1, 4):
-                        nr, nc = r + dr * k, c + dc * k
-                        if not (0 <= nr < rows and 0 <= nc < cols):
-                            ok = False
-                            break
-                        if self.owner[nr][nc] != player:
-                            ok = False
-                            break
-                    if ok:
-                        return True
-        return False
+        super().undo_last()
+        if not self.game_over:
+            self.logged = False
+
+
+# ----------------- Sessions ---------------------------------
+
+CHECKPOINT_INTERVAL = float(os.environ.get("CHECKPOINT_INTERVAL", "5"))  # seconds
+# UIGameState attributes saved along with the engine state
+CHECKPOINT_ATTRS = (
+    "player_names",
+    "player_colors",
+    "dice_font_scale",
+    "text_font_scale",
+    "badge_scale",
+    "badge_text_scale",
+    "computer",
+    "logged",
+)
+API_MAX_GAMES = int(os.environ.get("API_MAX_GAMES", "1000"))  # oldest go first
+# signs the browser id that picks each person's table; see storage_secret()
+SECRET_FILE = os.environ.get("STORAGE_SECRET_FILE", "storage_secret")
+BOT_TIME_BUDGET = float(os.environ.get("BOT_TIME_BUDGET", "1.0"))  # seconds per move
+FLUSH_INTERVAL = 1 / 60  # seconds; a page's UI is flushed at most once per frame
+DUPLICATE_WINDOW = 0.35  # seconds; the same input again this soon is a double tap
+
+
+def storage_secret() -> str:
+    """STORAGE_SECRET, else a random secret made on first start and kept in SECRET_FILE."""
+    secret = os.environ.get("STORAGE_SECRET")
+    if secret:
+        return secret
+    try:
+        with open(SECRET_FILE, "r", encoding="utf-8") as f:
+            secret = f.read().strip()
+        if secret:
+            return secret
+    except FileNotFoundError:
+        pass
+    secret = secrets.token_hex(32)
+    # readable by the owner only; O_EXCL so two first starts cannot race
+    try:
+        fd = os.open(SECRET_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        return storage_secret()
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(secret + "\n")
+    return secret
 
-    def _check_four_winner(self):
-        p1 = self._has_four_in_line("Player 1")
-        p2 = self._has_four_in_line("Player 2")
-        if p1 and not p2:
-            return "Player 1"
-        if p2 and not p1:
-            return "Player 2"
-        if p1 and p2:
-            return None
-        return None
-
-    def _decide_winner_by_score(self, reason: str):
-        p1, p2 = count_total_points(self.grid, self.owner)
-        self.game_over = True
-        self.win_reason = reason
-        if p1 > p2:
-            self.winner = "Player 1"
-        elif p2 > p1:
-            self.winner = "Player 2"
-        else:
-            self.winner = None  # tie
 
-    def _after_turn(self, last_player: str):
-        """Evaluate win conditions after last_player finished their turn."""
-        if self.game_over:
-            return
+def session_key(room: str | None) -> str:
+    if room:
+        return f"room:{room}"
+    return f"browser:{app.storage.browser['id']}"
 
-        # 1) check 4-in-a-row instant win
-        four_winner = self._check_four_winner()
-        if four_winner is not None:
-            self.game_over = True
-            if four_winner:
-                self.winner = four_winner
-                self.win_reason = "4 tiles in a line"
-            else:
-                self.winner = None
-                self.win_reason = "Both have 4-in-a-line"
-            return
 
-        p1_score, p2_score = count_total_points(self.grid, self.owner)
+# ----------------- Spectator view ---------------------------
+#
+# Spectators get the whole table as one HTML string, built once per change
+# by Session.broadcast() and shared by every spectator of the table.
 
-        # 2) handle pending last turn due to 21+ rule
-        if self.pending_last_turn_for:
-            if last_player == self.pending_last_turn_for:
-                self.pending_last_turn_for = None
-                self._decide_winner_by_score("21+ reached, last turn played")
-                return
-        else:
-            # if someone just crossed 21+ this turn, trigger last turn for the opponent
-            if p1_score >= 21 or p2_score >= 21:
-                self.pending_last_turn_for = (
-                    "Player 2" if last_player == "Player 1" else "Player 1"
-                )
+SPECTATOR_CSS = """
+<style>
+  body { background-color: #000000; }
+  .pk-table { display:flex; gap:24px; align-items:flex-start; justify-content:center; color:white; }
+  .pk-player { padding:18px; border-radius:14px; text-align:center; min-width:180px;
+               border:4px solid #000000; font-size:1.35em; font-weight:bold;
+               text-shadow:2px 2px 4px rgba(0,0,0,0.8); }
+  .pk-player.pk-active { border-color:#FFFFFF; box-shadow:0 0 18px rgba(255,255,255,0.9); }
+  .pk-name { font-size:1.2em; margin-bottom:8px; }
+  .pk-board { display:grid; gap:4px; }
+  .pk-tile { border:2px solid white; border-radius:10px; position:relative; color:black; }
+  .pk-value { position:absolute; left:10px; top:10px; font-weight:bold; }
+  .pk-badge { position:absolute; bottom:10px; right:10px; background:white; border-radius:50%;
+              border:2px solid grey; display:flex; align-items:center; justify-content:center;
+              font-weight:bold; }
+  .pk-status { color:#f9e79f; text-align:center; font-size:1.4em; font-weight:bold; margin-top:12px; }
+</style>
+"""
 
-        # 3) rounds limit: once both played 6 rounds, higher score wins
-        if self.rounds["Player 1"] >= 6 and self.rounds["Player 2"] >= 6:
-            self._decide_winner_by_score("Both played 6 rounds")
-            return
 
-        if self.game_over:
-            return
+def spectator_html(game: UIGameState, settings: Settings) -> str:
+    """Read-only view of the table: both players and the board."""
+    styles = game_tile_styles(game, settings)
+    palette = settings.palette
+    badge = (
+        f"<span class='pk-badge' style='width:{styles.badge_size}; "
+        f"height:{styles.badge_size}; font-size:{styles.pts_fs}'>"
+    )
+    value_style = {True: styles.dice_fs, False: styles.text_fs}
+
+    def player_html(player: str) -> str:
+        active = " pk-active" if player == game.player and not game.game_over else ""
+        return (
+            f"<div class='pk-player{active}' style='background:{game.player_colors[player]}'>"
+            f"<div class='pk-name'>{html.escape(game.player_names[player])}</div>"
+            f"<div>Points: {game.score(player)}</div>"
+            f"<div>Rounds: {game.rounds[player]}</div>"
+            f"<div>Tiles: {game.tile_counts[player]}</div>"
+            "</div>"
+        )
 
-        # 4) choose next player
-        if self.pending_last_turn_for:
-            self.player = self.pending_last_turn_for
+    tiles = []
+    size = f"; width:{styles.cell_size}; height:{styles.cell_size}'>"
+    for r in range(game.rows):
+        for c in range(game.cols):
+            info = tile_info(game.grid[r][c], palette)
+            tiles.append(
+                "<div class='pk-tile' style='background:" + tile_bg(game, r, c, palette) + size
+                + "<span class='pk-value' style='font-size:" + value_style[info.is_dice] + "'>"
+                + info.html_glyphs + "</span>"
+                + badge + str(info.points) + "</span></div>"
+            )
+
+    if game.game_over:
+        if game.winner:
+            status = f"🏆 {html.escape(game.player_names[game.winner])} wins!"
         else:
-            self.player = "Player 2" if last_player == "Player 1" else "Player 1"
-
-    def _can_player_act(self, player: str) -> bool:
-        if self.game_over:
-            return False
-        if self.pending_last_turn_for and player != self.pending_last_turn_for:
-            return False
-        if self.rounds[player] >= 6:
-            return False
-        return True
-
-    def play(self, r, c) -> str:
-        current = self.player
-
-        if not self._can_player_act(current):
-            return "blocked"
-
-        owner = self.owner[r][c]
+            status = "🤝 It's a tie!"
+        if game.win_reason:
+            status += f" ({html.escape(game.win_reason)})"
+    else:
+        status = f"{html.escape(game.player_names[game.player])} to play"
 
-        if owner == current:
-            self.owner[r][c] = None
-            return "removed"
+    return (
+        "<div class='pk-table'>"
+        + player_html("Player 1")
+        + f"<div class='pk-board' style='grid-template-columns:repeat({game.cols}, auto)'>"
+        + "".join(tiles)
+        + "</div>"
+        + player_html("Player 2")
+        + f"</div><div class='pk-status'>{status}</div>"
+    )
 
-        if owner is not None and owner != current:
-            return "blocked"
 
-        if owner is None:
-            self._save_snapshot()
-            self.owner[r][c] = current
-            self.rounds[current] += 1
-            self._after_turn(current)
-            return "placed"
+# ----------------- Server -----------------------------------
+#
+# Everything the pages and routes of one process share. create_app() makes
+# one and wires it up; nothing here runs at import.
+#
+# Small boards can show who wins from here with perfect play. Values come from
+# a table built with `python solver.py --seed N` when one exists for the grid,
+# otherwise from a solve in a worker process. Both are shared by all tables.
+
+SOLUTIONS_DIR = os.environ.get("SOLUTIONS_DIR", solver.DEFAULT_DIR)
+SOLVE_MAX_CELLS = 16  # a live solve stays around a second up to 4x4
+
+
+class Server:
+    """Settings, tables, logs and metrics of one server process."""
+
+    def __init__(self, settings: Settings, settings_path: str = SETTINGS_FILE):
+        self.settings = settings
+        # settings dialog changes are debounced and written off the event loop
+        self.config_writer = WriteBehind(settings_path)
+
+        # finished games are kept for analytics; writes happen on a background thread
+        self.game_log = gamelog.GameLog(os.environ.get("GAME_LOG", gamelog.DEFAULT_PATH))
+        # live games are checkpointed to disk so a restart does not lose them
+        checkpoint_path = os.environ.get("CHECKPOINT_PATH", checkpoint.DEFAULT_PATH)
+        self.checkpoints = checkpoint.Checkpointer(checkpoint_path, extra_attrs=CHECKPOINT_ATTRS)
+        # one GameState per browser, or per room when ?room=<code> is given
+        self.sessions = SessionStore(self.new_game, on_evict=self.on_evict(self.checkpoints))
+        # API games get a store, cap and checkpoint of their own, so bots
+        # creating games cannot push people's tables out
+        self.api_checkpoints = checkpoint.Checkpointer(
+            checkpoint_path + ".api", extra_attrs=CHECKPOINT_ATTRS
+        )
+        self.api_sessions = SessionStore(
+            self.new_game,
+            max_sessions=API_MAX_GAMES,
+            on_evict=self.on_evict(self.api_checkpoints),
+        )
+        self.stores = (
+            (self.sessions, self.checkpoints),
+            (self.api_sessions, self.api_checkpoints),
+        )
 
-        return "blocked"
+        self.telemetry = metrics.Registry()
+        self.telemetry.gauge(
+            "active_sessions", "Game tables in memory", lambda: len(self.sessions)
+        )
+        self.telemetry.gauge(
+            "api_games", "Games created through the JSON API", lambda: len(self.api_sessions)
+        )
+        self.telemetry.gauge(
+            "connected_players",
+            "Player views connected to a table",
+            lambda: sum(len(s.listeners) for store, _ in self.stores for s in store),
+        )
+        self.telemetry.gauge(
+            "connected_spectators",
+            "Spectator views connected to a table",
+            lambda: sum(len(s.spectators) for store, _ in self.stores for s in store),
+        )
+        self.profiler = metrics.SamplingProfiler()
 
-    def pass_turn(self):
-        current = self.player
-        if not self._can_player_act(current):
-            return
-        self._save_snapshot()
-        self.rounds[current] += 1
-        self._after_turn(current)
+        self.solver_tables = {}  # rules digest -> solver.Table
+        self.solved = {}  # (rules digest, position key) -> value from live solves
 
+    def new_game(self) -> UIGameState:
+        return UIGameState(self.settings)
 
-game = GameState()
+    def on_evict(self, checkpoints: checkpoint.Checkpointer):
+        def evicted(session):
+            self.log_game(session.game)
+            checkpoints.forget(session.key)
 
+        return evicted
 
-def refresh_ui():
-    board.refresh()
-    left_panel.refresh()
-    right_panel.refresh()
+    def store_for(self, key: str) -> tuple:
+        """(sessions, checkpoints) holding key: the API game's, else the browser tables'."""
+        if key in self.api_sessions:
+            return self.api_sessions, self.api_checkpoints
+        return self.sessions, self.checkpoints
 
+    def log_game(self, game) -> bool:
+        """Record a finished game once; True if it was recorded now."""
+        if not game.game_over or game.logged:
+            return False
+        self.game_log.record(game)
+        game.logged = True
+        return True
 
-# ---------------- Global Dark Theme -------------------------
+    def update_settings(self, section: str, key: str, value) -> None:
+        """Swap in a new settings snapshot and save it in the background."""
+        self.settings = self.settings.replace(section, key, value)
+        self.config_writer.schedule(self.settings.to_dict())
+
+    def spectator_html(self, game: UIGameState) -> str:
+        return spectator_html(game, self.settings)
+
+    async def save_checkpoint(self):
+        # encode on the event loop, where games change; write on a thread
+        for sessions, checkpoints in self.stores:
+            prepared = checkpoints.prepare(sessions)
+            if prepared is not None:
+                await run.io_bound(checkpoints.write, prepared)
+
+    def known_solution(self, game):
+        """Perfect-play value of the position if a table or earlier solve has it."""
+        rules = solver.rules_for(game)
+        key = rules.key(solver.state_of(game))
+        value = self.solved.get((rules.digest, key))
+        if value is not None:
+            return value
+        table = self.solver_tables.get(rules.digest)
+        if table is None:
+            path = solver.table_path(rules, SOLUTIONS_DIR)
+            if not os.path.exists(path):
+                return None
+            table = self.solver_tables[rules.digest] = solver.Table(path)
+        return table.get(key)
+
+    async def solve_live(self, game):
+        """Solve the position in a worker process and remember the value."""
+        rules = solver.rules_for(game)
+        state = solver.state_of(game)
+        value = await run.cpu_bound(solver.solve_position, rules.spec(), state)
+        if len(self.solved) > 100_000:
+            self.solved.clear()
+        self.solved[(rules.digest, rules.key(state))] = value
+        return value
+
+    def close(self):
+        self.config_writer.flush()
+        for sessions, checkpoints in self.stores:
+            for session in sessions:
+                if self.log_game(session.game):
+                    # journal the flag, or the restored game is logged again
+                    checkpoints.note(session.key, session.game)
+            checkpoints.checkpoint(sessions)
+        self.game_log.close()
+        for table in self.solver_tables.values():
+            table.close()
+        self.solver_tables.clear()
+
+
+# ----------------- Metrics ----------------------------------
+#
+# Prometheus text on /metrics. Only local clients may read it (or anyone,
+# with METRICS_PUBLIC=1), since it is served on the game's own port.
+
+METRICS_PUBLIC = os.environ.get("METRICS_PUBLIC") == "1"
+
+
+def metrics_allowed(request: Request) -> bool:
+    host = request.client.host if request.client else ""
+    return METRICS_PUBLIC or host in ("127.0.0.1", "::1", "localhost")
+
+
+def add_metrics_routes(server: Server):
+    telemetry, profiler = server.telemetry, server.profiler
+
+    @app.get("/metrics")
+    def metrics_endpoint(request: Request):
+        if not metrics_allowed(request):
+            return PlainTextResponse("forbidden\n", status_code=403)
+        return PlainTextResponse(
+            telemetry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+        )
 
-ui.add_head_html("""
-<style>
-  body {
-    background-color: #000000;
-  }
-</style>
-""")
-
-
-# ---------------- Game Over Dialog (gold overlay) -----------
-
-with ui.dialog() as game_over_dialog, ui.card().style(
-    "min-width: 420px; max-width: 520px; "
-    "background: linear-gradient(135deg, #f9e79f, #f1c40f, #b7950b); "
-    "border-radius: 18px; "
-    "border: 3px solid #ffffff; "
-    "box-shadow: 0 0 32px rgba(255, 255, 255, 0.95); "
-    "color: #1b1b1b; text-align: center; padding: 24px;"
-):
-    go_title = ui.html(
-        "<div style='font-size:2.0em; font-weight:bold; "
-        "text-shadow:1px 1px 3px rgba(0,0,0,0.5); margin-bottom:8px;'>"
-        "🏆 Game over</div>",
-        sanitize=False,
-    )
-    go_detail = ui.html(
-        "<div style='font-size:1.2em; font-weight:bold; "
-        "text-shadow:1px 1px 2px rgba(0,0,0,0.4); margin-bottom:12px;'></div>",
-        sanitize=False,
-    )
+    @app.get("/metrics/profile")
+    async def profile_endpoint(request: Request, action: str = "dump"):
+        """Sampling profiler of the event loop: ?action=start, stop or dump.
 
-    def new_game():
-        game.reset_board()
+        stop and dump return collapsed stacks for flame graph tools.
+        """
+        if not metrics_allowed(request):
+            return PlainTextResponse("forbidden\n", status_code=403)
+        if action == "start":
+            # async route, so this runs on (and samples) the event loop thread
+            profiler.start()
+            return PlainTextResponse("profiling\n")
+        if action == "stop":
+            profiler.stop()
+        return PlainTextResponse(profiler.collapsed())
+
+
+# ---------------- JSON API ----------------------------------
+#
+# Bots and tools play through plain FastAPI routes: no page, no elements.
+# API games are rooms in a store of their own, capped at API_MAX_GAMES, so
+# a flood of them evicts older API games and never a browser's table. They
+# are checkpointed like any other table, and /watch?room=<id> or
+# /?room=<id> show them live. Handlers are async so they run on the event loop, which
+# owns the games.
+
+
+def api_error(message: str, status: int) -> JSONResponse:
+    return JSONResponse({"error": message}, status_code=status)
+
+
+async def json_body(request: Request) -> dict:
+    body = await request.body()
+    if not body:
+        return {}
+    data = json.loads(body)
+    if not isinstance(data, dict):
+        raise ValueError("expected a JSON object")
+    return data
+
+
+def add_api_routes(server: Server):
+    sessions, checkpoints = server.api_sessions, server.api_checkpoints
+
+    @app.post("/api/games")
+    async def api_create_game(request: Request):
+        """New game; optional body {"seed": int, "rows": int, "cols": int}."""
+        try:
+            data = await json_body(request)
+            rows, cols = api.board_size(data, server.settings.rows, server.settings.cols)
+            seed = api.parse_seed(data)
+        except ValueError as e:
+            return api_error(str(e), 400)
+        game_id = uuid.uuid4().hex[:12]
+        session = sessions.get(session_key(game_id))
+        game = session.game
+        if seed is not None or (rows, cols) != (game.rows, game.cols):
+            game.rows, game.cols = rows, cols
+            game.reset_board(seed=seed)
+        checkpoints.note(session.key, game)
+        return JSONResponse({"id": game_id, "state": api.state_json(game)}, status_code=201)
+
+    @app.get("/api/games/{game_id}")
+    async def api_get_game(game_id: str):
+        session = sessions.find(session_key(game_id))
+        if session is None:
+            return api_error("no such game", 404)
+        return {"id": game_id, "state": api.state_json(session.game)}
+
+    @app.post("/api/games/{game_id}/moves")
+    async def api_play_moves(game_id: str, request: Request):
+        """Apply {"moves": [...]} in order and return each result and the final state."""
+        try:
+            body = await json_body(request)
+        except ValueError as e:
+            return api_error(str(e), 400)
+        # looked up after the last await, so the game cannot be evicted under us
+        session = sessions.find(session_key(game_id))
+        if session is None:
+            return api_error("no such game", 404)
+        game = session.game
+        try:
+            moves = api.parse_moves(body.get("moves"), game.rows, game.cols)
+        except ValueError as e:
+            return api_error(str(e), 400)
+        if game.bot_thinking:
+            return api_error("the computer is moving", 409)
+        results = api.apply_moves(game, moves)
+        server.telemetry.moves.inc(sum(r in ("placed", "passed") for r in results))
+        # as changed() in the page, for everyone watching this table
+        checkpoints.note(session.key, game)
+        session.notify()
+        session.broadcast(server.spectator_html)
+        return {"id": game_id, "results": results, "state": api.state_json(game)}
+
+
+# ---------------- Pages -------------------------------------
+#
+# Built per client when a route is opened; add_pages() only registers them.
+
+
+def player_page(server: Server, room: str | None):
+    """The table for this browser, or for a room everyone with the code shares."""
+    telemetry = server.telemetry
+    key = session_key(room)
+    sessions, checkpoints = server.store_for(key)
+    session = sessions.get(key)
+    game = session.game
+
+    @telemetry.timed("refresh_ui")
+    def refresh_ui():
+        """Push only what changed since the last sync to this client."""
+        sync_board()
+        sync_panel("Player 1")
+        sync_panel("Player 2")
+        sync_roll()
+        if view["solution"]:
+            sync_solution()
+
+    def changed():
+        """Refresh this view and every other view of the same table."""
+        sessions.touch(key)
+        checkpoints.note(key, game)
         refresh_ui()
-        game_over_dialog.close()
+        session.notify(skip=refresh_ui)
+        session.broadcast(server.spectator_html)
+
+    def unsubscribe():
+        if refresh_ui in session.listeners:
+            session.listeners.remove(refresh_ui)
+
+    session.listeners.append(refresh_ui)
+    ui.context.client.on_delete(unsubscribe)
+
+    # Global dark theme
+    ui.add_head_html("""
+    <style>
+      body {
+        background-color: #000000;
+      }
+    </style>
+    """)
+
+    # Game over dialog (gold overlay)
+    with ui.dialog() as game_over_dialog, ui.card().style(
+        "min-width: 420px; max-width: 520px; "
+        "background: linear-gradient(135deg, #f9e79f, #f1c40f, #b7950b); "
+        "border-radius: 18px; "
+        "border: 3px solid #ffffff; "
+        "box-shadow: 0 0 32px rgba(255, 255, 255, 0.95); "
+        "color: #1b1b1b; text-align: center; padding: 24px;"
+    ):
+        go_title = ui.html(
+            "<div style='font-size:2.0em; font-weight:bold; "
+            "text-shadow:1px 1px 3px rgba(0,0,0,0.5); margin-bottom:8px;'>"
+            "🏆 Game over</div>",
+            sanitize=False,
+        )
+        go_detail = ui.html(
+            "<div style='font-size:1.2em; font-weight:bold; "
+            "text-shadow:1px 1px 2px rgba(0,0,0,0.4); margin-bottom:12px;'></div>",
+            sanitize=False,
+        )
 
-    ui.separator().style("margin: 8px 0 12px 0;")
+        def new_game():
+            server.log_game(game)
+            game.reset_board()
+            changed()
+            game_over_dialog.close()
+
+        ui.separator().style("margin: 8px 0 12px 0;")
+
+        with ui.row().style("justify-content:center; gap:12px;"):
+            ui.button("New game", on_click=new_game).style(
+                "font-weight:bold; padding:8px 18px; "
+                "background:#1b1b1b; color:#f9e79f;"
+            )
+            ui.button("Close", on_click=game_over_dialog.close).props("flat").style(
+                "font-weight:bold; padding:8px 16px; color:#1b1b1b;"
+            )
+
+    def show_game_over():
+        if not game.game_over:
+            return
 
-    with ui.row().style("justify-content:center; gap:12px;"):
-        ui.button("New game", on_click=new_game).style(
-            "font-weight:bold; padding:8px 18px; "
-            "background:#1b1b1b; color:#f9e79f;"
-        )
-        ui.button("Close", on_click=game_over_dialog.close).props("flat").style(
-            "font-weight:bold; padding:8px 16px; color:#1b1b1b;"
+        if game.winner:
+            winner_name = game.player_names[game.winner]
+            go_title.set_content(
+                f"<div style='font-size:2.0em; font-weight:bold; "
+                f"text-shadow:1px 1px 3px rgba(0,0,0,0.5); margin-bottom:8px;'>"
+                f"🏆 {winner_name} wins!</div>"
+            )
+        else:
+            go_title.set_content(
+                "<div style='font-size:2.0em; font-weight:bold; "
+                "text-shadow:1px 1px 3px rgba(0,0,0,0.5); margin-bottom:8px;'>"
+                "🤝 It's a tie!</div>"
+            )
+
+        reason_html = f"Reason: {game.win_reason}" if game.win_reason else ""
+        go_detail.set_content(
+            f"<div style='font-size:1.2em; font-weight:bold; "
+            f"text-shadow:1px 1px 2px rgba(0,0,0,0.4); margin-bottom:12px;'>{reason_html}</div>"
         )
 
+        game_over_dialog.open()
 
-def show_game_over():
-    if not game.game_over:
-        return
+    # Computer opponent
+    #
+    # The search runs in a worker process so the event loop never blocks.
 
-    if game.winner:
-        winner_name = game.player_names[game.winner]
-        go_title.set_content(
-            f"<div style='font-size:2.0em; font-weight:bold; "
-            f"text-shadow:1px 1px 3px rgba(0,0,0,0.5); margin-bottom:8px;'>"
-            f"🏆 {winner_name} wins!</div>"
-        )
-    else:
-        go_title.set_content(
-            "<div style='font-size:2.0em; font-weight:bold; "
-            "text-shadow:1px 1px 3px rgba(0,0,0,0.5); margin-bottom:8px;'>"
-            "🤝 It's a tie!</div>"
+    async def computer_turn():
+        if game.computer is None or game.game_over or game.player != game.computer:
+            return
+        if game.bot_thinking:
+            return
+        before = position_key(game)
+        game.bot_thinking = True
+        bot_label.set_text("Computer is thinking…")
+        try:
+            result = await run.cpu_bound(bot.best_move, game.copy(), BOT_TIME_BUDGET)
+        finally:
+            game.bot_thinking = False
+        # someone may have undone or reset while we were searching
+        if game.player != game.computer or position_key(game) != before:
+            return
+        # a refused move (say, one the roll does not allow) must not stall the table
+        if result.move is None or game.play(*result.move) == "blocked":
+            game.pass_turn()
+        telemetry.moves.inc()
+        bot_label.set_text(
+            f"Computer: depth {result.depth}, {result.nodes_per_second:,.0f} nodes/s"
         )
+        changed()
+        if game.game_over:
+            show_game_over()
+
+    def humans_turn() -> bool:
+        return not game.bot_thinking and game.player != game.computer
+
+    # Input coalescing
+    #
+    # Moves change the game at once and in arrival order, but the page is
+    # flushed (changed()) at most once per FLUSH_INTERVAL, however fast
+    # inputs come. An input after a quiet frame is flushed right away; only
+    # the ones that follow it within the frame wait and share one flush.
+    #
+    # The same tile or Pass again within DUPLICATE_WINDOW is a double tap
+    # and is dropped, so a double-click cannot claim a tile and then
+    # un-claim it through the "removed" branch. Any other input in between
+    # (Undo, Redo, a roll) makes the repeat a real one.
+
+    client = ui.context.client
+    inputs = {"last": None, "at": 0.0, "flush": None, "flushed": 0.0}
+
+    def duplicate_input(event) -> bool:
+        now = time.monotonic()
+        if event == inputs["last"] and now - inputs["at"] < DUPLICATE_WINDOW:
+            return True
+        inputs["last"], inputs["at"] = event, now
+        return False
 
-    reason_html = f"Reason: {game.win_reason}" if game.win_reason else ""
-    go_detail.set_content(
-        f"<div style='font-size:1.2em; font-weight:bold; "
-        f"text-shadow:1px 1px 2px rgba(0,0,0,0.4); margin-bottom:12px;'>{reason_html}</div>"
-    )
-
-    game_over_dialog.open()
+    def forget_input():
+        inputs["last"] = None
 
+    def request_flush():
+        if inputs["flush"] is not None:
+            return
+        wait = inputs["flushed"] + FLUSH_INTERVAL - time.monotonic()
+        if wait <= 0:
+            flush()
+        else:
+            inputs["flush"] = asyncio.get_running_loop().call_later(wait, flush)
 
-# ---------------- Settings Modal ----------------------------
+    def flush():
+        inputs["flush"] = None
+        inputs["flushed"] = time.monotonic()
+        if client.is_deleted:
+            return
+        with client, telemetry.timed("flush"):
+            changed()
+            if game.game_over:
+                show_game_over()
+        background_tasks.create(computer_turn(), name="computer turn")
+
+    # Settings modal
+    with ui.dialog() as setup_dialog, ui.card().style("min-width: 360px;"):
+        ui.markdown("### ⚙ Game Setup")
+
+        # player name + color rows
+        for p in ["Player 1", "Player 2"]:
+            with ui.row().style("align-items:center; gap:8px; margin-bottom:6px;"):
+                ui.label(p).style("width:80px;font-weight:bold;")
+
+                def handle_name_change(e, player=p):
+                    game.player_names[player] = e.value
+                    server.update_settings("player_names", player, e.value)
+                    changed()
+
+                ui.input(
+                    value=game.player_names[p],
+                    on_change=handle_name_change,
+                ).style("flex:1;")
+
+                def handle_color_change(e, player=p):
+                    game.player_colors[player] = e.value
+                    server.update_settings("player_colors", player, e.value)
+                    changed()
+
+                ui.color_input(
+                    value=game.player_colors[p],
+                    on_change=handle_color_change,
+                ).style("width:70px;")
 
-with ui.dialog() as setup_dialog, ui.card().style("min-width: 360px;"):
-    ui.markdown("### ⚙ Game Setup")
+        ui.separator()
 
-    # player name + color rows
-    for p in ["Player 1", "Player 2"]:
-        with ui.row().style("align-items:center; gap:8px; margin-bottom:6px;"):
-            ui.label(p).style("width:80px;font-weight:bold;")
+        # DICE SIZE SLIDER
+        ui.label("Dice size")
+        def on_dice_size_change(e):
+            game.dice_font_scale = e.value
+            server.update_settings("fonts", "dice_font_scale", e.value)
+            changed()
+
+        ui.slider(
+            min=0.7,
+            max=4.0,
+            step=0.1,
+            value=game.dice_font_scale,
+            on_change=on_dice_size_change,
+        ).props("label-always")
+
+        # TEXT SIZE SLIDER
+        ui.label("Text size")
+        def on_text_size_change(e):
+            game.text_font_scale = e.value
+            server.update_settings("fonts", "text_font_scale", e.value)
+            changed()
+
+        ui.slider(
+            min=0.7,
+            max=4.0,
+            step=0.1,
+            value=game.text_font_scale,
+            on_change=on_text_size_change,
+        ).props("label-always")
+
+        # BADGE SIZE SLIDER
+        ui.label("Badge size")
+        def on_badge_change(e):
+            game.badge_scale = e.value
+            server.update_settings("fonts", "badge_scale", e.value)
+            changed()
+
+        ui.slider(
+            min=0.5,
+            max=4.0,
+            step=0.1,
+            value=game.badge_scale,
+            on_change=on_badge_change,
+        ).props("label-always")
+
+        # BADGE TEXT SIZE SLIDER
+        ui.label("Badge text size")
+        def on_badge_text_change(e):
+            game.badge_text_scale = e.value
+            server.update_settings("fonts", "badge_text_scale", e.value)
+            changed()
+
+        ui.slider(
+            min=0.5,
+            max=4.0,
+            step=0.1,
+            value=game.badge_text_scale,
+            on_change=on_badge_text_change,
+        ).props("label-always")
 
-            def handle_name_change(e, player=p):
-                game.player_names[player] = e.value
-                config["player_names"][player] = e.value
-                save_config(config)
-                refresh_ui()
+        ui.separator()
 
-            ui.input(
-                value=game.player_names[p],
-                on_change=handle_name_change,
-            ).style("flex:1;")
+        async def on_computer_change(e):
+            game.computer = "Player 2" if e.value else None
+            changed()
+            await computer_turn()
 
-            def handle_color_change(e, player=p):
-                game.player_colors[player] = e.value
-                config["player_colors"][player] = e.value
-                save_config(config)
-                refresh_ui()
+        ui.switch(
+            "Player 2 is the computer",
+            value=game.computer is not None,
+            on_change=on_computer_change,
+        )
 
-            ui.color_input(
-                value=game.player_colors[p],
-                on_change=handle_color_change,
-            ).style("width:70px;")
+        # hints are a per-viewer overlay, not part of the table
+        def on_hints_change(e):
+            view["hints"] = e.value
+            sync_board()
 
-    ui.separator()
+        ui.switch("Show move hints", value=False, on_change=on_hints_change)
 
-    # DICE SIZE SLIDER
-    ui.label("Dice size")
-    def on_dice_size_change(e):
-        game.dice_font_scale = e.value
-        config["fonts"]["dice_font_scale"] = e.value
-        save_config(config)
-        refresh_ui()
+        def on_solution_change(e):
+            view["solution"] = e.value
+            sync_solution()
 
-    ui.slider(
-        min=0.7,
-        max=4.0,
-        step=0.1,
-        value=game.dice_font_scale,
-        on_change=on_dice_size_change,
-    ).props("label-always")
-
-    # TEXT SIZE SLIDER
-    ui.label("Text size")
-    def on_text_size_change(e):
-        game.text_font_scale = e.value
-        config["fonts"]["text_font_scale"] = e.value
-        save_config(config)
-        refresh_ui()
+        if game.rows * game.cols <= SOLVE_MAX_CELLS:
+            ui.switch("Show perfect-play result", value=False, on_change=on_solution_change)
 
-    ui.slider(
-        min=0.7,
-        max=4.0,
-        step=0.1,
-        value=game.text_font_scale,
-        on_change=on_text_size_change,
-    ).props("label-always")
-
-    # BADGE SIZE SLIDER
-    ui.label("Badge size")
-    def on_badge_change(e):
-        game.badge_scale = e.value
-        config["fonts"]["badge_scale"] = e.value
-        save_config(config)
-        refresh_ui()
+        ui.separator()
 
-    ui.slider(
-        min=0.5,
-        max=4.0,
-        step=0.1,
-        value=game.badge_scale,
-        on_change=on_badge_change,
-    ).props("label-always")
-
-    # BADGE TEXT SIZE SLIDER
-    ui.label("Badge text size")
-    def on_badge_text_change(e):
-        game.badge_text_scale = e.value
-        config["fonts"]["badge_text_scale"] = e.value
-        save_config(config)
-        refresh_ui()
+        def reset():
+            server.log_game(game)
+            game.reset_board()
+            changed()
 
-    ui.slider(
-        min=0.5,
-        max=4.0,
-        step=0.1,
-        value=game.badge_text_scale,
-        on_change=on_badge_text_change,
-    ).props("label-always")
+        ui.button("Reset board", on_click=reset).props("outline")
+        if room:
+            ui.link("Spectator view", f"/watch?room={room}", new_tab=True)
+        ui.button("Close", on_click=setup_dialog.close)
 
-    ui.separator()
+    # Player panels
+    #
+    # Panels are built once; sync_panel() only pushes values that changed.
 
-    def reset():
-        game.reset_board()
-        refresh_ui()
+    panels = {}
 
-    ui.button("Reset board", on_click=reset).props("outline")
-    ui.button("Close", on_click=setup_dialog.close)
+    def stat_html(value) -> str:
+        return (
+            "<span style='font-weight:bold; text-shadow:2px 2px 4px rgba(0,0,0,0.8);'>"
+            f"{value}</span>"
+        )
 
+    def name_html(name: str) -> str:
+        return (
+            "<div style='font-size:1.6em; font-weight:bold; "
+            f"text-shadow:2px 2px 4px rgba(0,0,0,0.9);'>{name}</div>"
+        )
 
-# ---------------- Player Panels -----------------------------
+    def do_pass():
+        if not humans_turn() or duplicate_input(("pass",)):
+            return
+        with telemetry.timed("do_pass"):
+            moves = len(game.history)
+            game.pass_turn()
+            if len(game.history) > moves:
+                telemetry.moves.inc()
+                request_flush()
+
+    @telemetry.timed("do_undo")
+    def do_undo():
+        if game.bot_thinking:
+            return
+        forget_input()
+        game.undo_last()
+        # against the computer, step back to the human's own turn
+        if game.computer and game.player == game.computer and game.history:
+            game.undo_last()
+        try:
+            game_over_dialog.close()
+        except Exception:
+            pass
+        request_flush()
+
+    def do_redo():
+        if game.bot_thinking:
+            return
+        with telemetry.timed("do_redo"):
+            forget_input()
+            game.redo()
+            if game.computer and game.player == game.computer and game.redo_stack:
+                game.redo()
+            request_flush()
+
+    def render_player(player: str):
+        with ui.card().style(
+            """
+            padding:18px;
+            border-radius:14px;
+            color:white;
+            text-align:center;
+            """
+        ) as card:
+            name = ui.html("", sanitize=False)
+
+            ui.separator()
+
+            values = {}
+            with ui.column().style("align-items:center; margin-top:8px; gap:10px;"):
+                for label in ("Points:", "Rounds:", "Tiles:"):
+                    with ui.row().style(
+                        "width:190px; justify-content:space-between; font-size:1.35em; padding:4px 0;"
+                    ):
+                        ui.html(stat_html(label), sanitize=False)
+                        values[label] = ui.html("", sanitize=False)
 
+            with ui.row().style(
+                "margin-top:12px; width:100%; display:flex; justify-content:space-between;"
+            ) as actions:
+                # Pass on the left (if game not over), Undo/Redo on the right
+                pass_button = ui.button("Pass", on_click=do_pass).style(
+                    "font-weight:bold; min-width:80px;"
+                )
+                pass_spacer = ui.label("").style("width:80px;")
+                with ui.row().style("gap:6px;"):
+                    undo_button = ui.button("Undo", on_click=do_undo).style(
+                        "font-weight:bold; min-width:80px;"
+                    )
+                    undo_spacer = ui.label("").style("width:80px;")
+                    redo_button = ui.button("Redo", on_click=do_redo).style(
+                        "font-weight:bold; min-width:80px;"
+                    )
 
-def render_player(player: str):
-    score_p1, score_p2 = count_total_points(game.grid, game.owner)
-    t1, t2 = count_tiles(game.owner)
+        panels[player] = {
+            "card": card,
+            "name": name,
+            "values": values,
+            "actions": actions,
+            "pass": (pass_button, pass_spacer),
+            "undo": (undo_button, undo_spacer),
+            "redo": redo_button,
+            "shown": {},
+        }
+        sync_panel(player)
+
+    def sync_panel(player: str):
+        panel = panels[player]
+        shown = panel["shown"]
+        active = player == game.player
+
+        def push(field, value, apply):
+            if shown.get(field) != value:
+                shown[field] = value
+                apply(value)
+
+        push(
+            "card",
+            (game.player_colors[player], active),
+            lambda v: panel["card"].style(
+                f"background:{v[0]}; "
+                f"border:4px solid {'#FFFFFF' if v[1] else '#000000'}; "
+                f"box-shadow:{'0 0 18px rgba(255,255,255,0.9)' if v[1] else 'none'};"
+            ),
+        )
+        push("name", game.player_names[player], lambda v: panel["name"].set_content(name_html(v)))
+        push("Points:", game.score(player), lambda v: panel["values"]["Points:"].set_content(stat_html(v)))
+        push("Rounds:", game.rounds[player], lambda v: panel["values"]["Rounds:"].set_content(stat_html(v)))
+        push("Tiles:", game.tile_counts[player], lambda v: panel["values"]["Tiles:"].set_content(stat_html(v)))
+        push("actions", active, panel["actions"].set_visibility)
+
+        def show_one(pair, first):
+            pair[0].set_visibility(first)
+            pair[1].set_visibility(not first)
+
+        push("pass", not game.game_over, lambda v: show_one(panel["pass"], v))
+        push("undo", bool(game.history), lambda v: show_one(panel["undo"], v))
+        push("redo", bool(game.redo_stack), panel["redo"].set_visibility)
+
+    # Game board
+    #
+    # The board is rebuilt only when the grid or the font settings change.
+    # Moves go through sync_board(), which restyles just the tiles whose
+    # background changed.
+
+    tiles = {}
+    board_shown = {}
+    view = {"hints": False, "solution": False}
+
+    def board_key():
+        return (
+            id(game.grid),
+            view["hints"],
+            game.dice_font_scale,
+            game.text_font_scale,
+            game.badge_scale,
+            game.badge_text_scale,
+        )
 
-    score, tiles = (score_p1, t1) if player == "Player 1" else (score_p2, t2)
-    rounds = game.rounds[player]
-    name = game.player_names[player]
-    color = game.player_colors[player]
+    def click(row, col):
+        if game.game_over or not humans_turn() or duplicate_input(("click", row, col)):
+            return
+        with telemetry.timed("click"):
+            if game.play(row, col) != "blocked":
+                telemetry.moves.inc()
+                request_flush()
+            elif game.roll is not None and game.owner[row][col] is None:
+                ui.notify("The roll does not fit that tile")
+
+    @ui.refreshable
+    @telemetry.timed("board")
+    def board():
+        board_shown["key"] = board_key()
+        tiles.clear()
+
+        styles = game_tile_styles(game, server.settings)
+        palette = server.settings.palette
+
+        with ui.column().classes("items-center").style("gap:8px;"):
+            with ui.grid(columns=game.cols).style("gap:4px;"):
+                for r in range(game.rows):
+                    for c in range(game.cols):
+                        info = tile_info(game.grid[r][c], palette)
+                        bg = tile_bg(game, r, c, palette)
+
+                        tile = (
+                            ui.element("div")
+                            .style(styles.tile(bg))
+                            .on("click", lambda row=r, col=c: click(row, col))
+                        )
+                        tiles[(r, c)] = handle = [tile, bg, None, None]
 
-    active = player == game.player
+                        with tile:
+                            ui.label(info.glyphs).style(styles.label(info))
+                            with ui.element("div").style(styles.badge):
+                                ui.label(str(info.points)).style(styles.badge_label)
+                            if view["hints"]:
+                                handle[2] = ui.label("").style(styles.hint)
 
-    border = "#FFFFFF" if active else "#000000"
-    glow = "0 0 18px rgba(255,255,255,0.9)" if active else "none"
+            ui.button("⚙ Setup", on_click=setup_dialog.open).props("flat dense")
 
-    with ui.card().style(
-        f"""
-        background:{color};
-        padding:18px;
-        border-radius:14px;
-        border:4px solid {border};
-        box-shadow:{glow};
-        color:white;
-        text-align:center;
-        """
-    ):
-        ui.html(
-            f"<div style='font-size:1.6em; font-weight:bold; "
-            f"text-shadow:2px 2px 4px rgba(0,0,0,0.9);'>{name}</div>",
-            sanitize=False,
-        )
+        if view["hints"]:
+            sync_hints()
 
-        ui.separator()
+    def sync_board():
+        if board_shown.get("key") != board_key():
+            board.refresh()
+            return
+        palette = server.settings.palette
+        for (r, c), handle in tiles.items():
+            bg = tile_bg(game, r, c, palette)
+            if handle[1] != bg:
+                handle[1] = bg
+                handle[0].style("background:" + bg)
+        if view["hints"]:
+            sync_hints()
+
+    def sync_hints():
+        """Heat map of what each free cell is worth to the player to move."""
+        hints = {} if game.game_over else cell_hints(game)
+        top = max((h.gain for h in hints.values()), default=0) or 1
+        for cell, handle in tiles.items():
+            hint = hints.get(cell)
+            if hint is None:
+                shown = ("", "none")
+            elif hint.wins:
+                shown = (f"+{hint.gain} ★", "inset 0 0 0 6px #e74c3c")
+            elif hint.blocks_win:
+                shown = (f"+{hint.gain} ⛔", "inset 0 0 0 6px #3498db")
+            else:
+                shown = (f"+{hint.gain}", f"inset 0 0 0 6px rgba(255,215,0,{hint.gain / top:.2f})")
+            if handle[3] != shown:
+                handle[3] = shown
+                handle[2].set_text(shown[0])
+                handle[0].style("box-shadow:" + shown[1])
+
+    def solution_text(value) -> str:
+        if value == solver.TIE:
+            return "Perfect play: a tie"
+        winner = "Player 1" if value == solver.P1_WINS else "Player 2"
+        return f"Perfect play: {game.player_names[winner]} wins"
+
+    def sync_solution():
+        if not view["solution"] or game.game_over:
+            solution_label.set_text("")
+            return
+        value = server.known_solution(game)
+        if value is not None:
+            solution_label.set_text(solution_text(value))
+        elif not view.get("solving"):
+            solution_label.set_text("Perfect play: solving…")
+            background_tasks.create(solve_in_background(), name="solve position")
+
+    async def solve_in_background():
+        view["solving"] = True
+        try:
+            await server.solve_live(game.copy())
+        finally:
+            view["solving"] = False
+        # the position may have moved on meanwhile; sync looks it up again
+        sync_solution()
+
+    # Dice
+    #
+    # Rolling is optional: without a roll any free tile can be claimed, as
+    # with physical dice. A roll lasts until the turn ends. Clicking a die
+    # holds it for the next reroll; holds are this viewer's own.
+
+    held = set()  # indices into game.roll
+    roll_shown = {}
+
+    def faces(values) -> str:
+        return " ".join(die_face[str(v)] for v in values)
+
+    def roll_dice():
+        if game.game_over or not humans_turn():
+            return
+        keep = [game.roll[i] for i in sorted(held)] if game.roll else []
+        held.clear()
+        forget_input()
+        game.roll_dice(keep)
+        changed()
+
+    def toggle_hold(i):
+        if game.roll is None or game.rerolls_left <= 0:
+            return
+        held.symmetric_difference_update({i})
+        sync_roll()
 
-        with ui.column().style("align-items:center; margin-top:8px; gap:10px;"):
+    def hold_advice():
+        advice = advisor.advise(game)
+        if advice is None:
+            return
+        held.clear()
+        wanted = list(advice.keep)
+        for i, value in enumerate(game.roll):
+            if value in wanted:
+                wanted.remove(value)
+                held.add(i)
+        sync_roll()
+
+    def sync_roll():
+        roll = game.roll
+        if roll_shown.get("roll") != roll:
+            held.clear()  # a new roll, possibly from another viewer
+        key = (roll, game.rerolls_left, frozenset(held))
+        if roll_shown.get("key") == key:
+            return
+        roll_shown["roll"], roll_shown["key"] = roll, key
+        for i, label in enumerate(die_labels):
+            label.set_text(die_face[str(roll[i])] if roll else "")
+            label.style("outline:" + ("3px solid #f1c40f" if i in held else "none"))
+        if roll is None:
+            roll_button.set_text("🎲 Roll")
+        else:
+            roll_button.set_text(f"🎲 Reroll ({game.rerolls_left})")
+        roll_button.set_enabled(roll is None or game.rerolls_left > 0)
+        advice = advisor.advise(game)
+        if advice is None:
+            advice_label.set_text("")
+        else:
+            keep = faces(advice.keep) if advice.keep else "nothing"
+            advice_label.set_text(f"Advice: keep {keep}, {advice.hit_chance:.0%} to claim a tile")
 
-            def stat_row(label, value):
-                with ui.row().style(
-                    "width:190px; justify-content:space-between; font-size:1.35em; padding:4px 0;"
-                ):
-                    ui.html(
-                        f"<span style='font-weight:bold; text-shadow:2px 2px 4px rgba(0,0,0,0.8);'>{label}</span>",
-                        sanitize=False,
-                    )
-                    ui.html(
-                        f"<span style='font-weight:bold; text-shadow:2px 2px 4px rgba(0,0,0,0.8);'>{value}</span>",
-                        sanitize=False,
-                    )
+    # Final page layout
+    with ui.column().classes("items-center").style(
+        "width:100%; min-height:100vh; justify-content:center;"
+    ):
+        with ui.row().classes("items-start justify-center").style(
+            "gap:24px; max-width:90vw; margin:auto;"
+        ):
+            render_player("Player 1")
+            board()
+            render_player("Player 2")
+        with ui.row().classes("items-center").style("gap:12px;"):
+            roll_button = ui.button("🎲 Roll", on_click=roll_dice).props("outline")
+            die_labels = [
+                ui.label("")
+                .style("color:white; font-size:2.4em; border-radius:6px;")
+                .on("click", lambda i=i: toggle_hold(i))
+                for i in range(dice.DICE)
+            ]
+        advice_label = (
+            ui.label("")
+            .style("color:#bbbbbb; font-size:0.9em;")
+            .on("click", hold_advice)
+        )
+        bot_label = ui.label("").style("color:#bbbbbb; font-size:0.9em;")
+        solution_label = ui.label("").style("color:#bbbbbb; font-size:0.9em;")
 
-            stat_row("Points:", score)
-            stat_row("Rounds:", rounds)
-            stat_row("Tiles:", tiles)
+    # a restored or reloaded table may be waiting on the computer
+    ui.timer(0.1, computer_turn, once=True)
 
-        if active:
-            with ui.row().style(
-                "margin-top:12px; width:100%; display:flex; justify-content:space-between;"
-            ):
-                # Pass on the left (if game not over)
-                if not game.game_over:
-                    def do_pass():
-                        game.pass_turn()
-                        refresh_ui()
-                        if game.game_over:
-                            show_game_over()
-
-                    ui.button("Pass", on_click=do_pass).style(
-                        "font-weight:bold; min-width:80px;"
-                    )
-                else:
-                    ui.label("").style("width:80px;")
-
-                # Undo on the right (if history exists)
-                if game.history:
-                    def do_undo():
-                        game.undo_last()
-                        try:
-                            game_over_dialog.close()
-                        except Exception:
-                            pass
-                        refresh_ui()
-
-                    ui.button("Undo", on_click=do_undo).style(
-                        "font-weight:bold; min-width:80px;"
-                    )
-                else:
-                    ui.label("").style("width:80px;")
 
+def spectator_page(server: Server, room: str):
+    """Read-only view of a room; any number of viewers cost one render per move."""
+    key = session_key(room)
+    session = server.store_for(key)[0].get(key)
+    ui.add_head_html(SPECTATOR_CSS)
+    with ui.column().classes("items-center").style(
+        "width:100%; min-height:100vh; justify-content:center;"
+    ):
+        view = ui.html(session.frame(server.spectator_html), sanitize=False)
 
-@ui.refreshable
-def left_panel():
-    render_player("Player 1")
+    session.spectators.append(view.set_content)
 
+    def unsubscribe():
+        if view.set_content in session.spectators:
+            session.spectators.remove(view.set_content)
 
-@ui.refreshable
-def right_panel():
-    render_player("Player 2")
+    ui.context.client.on_delete(unsubscribe)
 
 
-# ---------------- Game Board -------------------------------
+def add_pages(server: Server):
+    @ui.page("/")
+    def index(room: str | None = None):
+        player_page(server, room)
 
+    @ui.page("/watch")
+    def watch(room: str):
+        spectator_page(server, room)
 
-@ui.refreshable
-def board():
-    dice_fs = f"{1.4 * game.dice_font_scale}vw"
-    text_fs = f"{1.4 * game.text_font_scale}vw"
-    badge_size = f"{2.4 * game.badge_scale}vw"
-    pts_fs = f"{1.4 * game.badge_text_scale}vw"
 
-    with ui.column().classes("items-center").style("gap:8px;"):
-        with ui.grid(columns=cols).style("gap:4px;"):
-            for r in range(rows):
-                for c in range(cols):
-                    v = game.grid[r][c].strip()
-                    pts = dice_and_rule_values.get(v, 0)
-                    owner = game.owner[r][c]
+# ---------------- App factory -------------------------------
+#
+# Importing this module defines things and nothing more: no config is read,
+# no file is opened and no page is built until create_app() runs, and pages
+# are then built per client as their route is opened.
 
-                    bg = (
-                        game.player_colors.get(owner, card_bg_color(v))
-                        if owner
-                        else card_bg_color(v)
-                    )
 
-                    def click(row=r, col=c):
-                        if game.game_over:
-                            return
-                        _ = game.play(row, col)
-                        refresh_ui()
-                        if game.game_over:
-                            show_game_over()
-
-                    tile = (
-                        ui.element("div")
-                        .style(
-                            f"background:{bg}; width:{cell_size}; height:{cell_size}; "
-                            "border:2px solid white; border-radius:10px; position:relative; cursor:pointer;"
-                        )
-                        .on("click", click)
-                    )
+def create_app(settings: Settings | None = None) -> Server:
+    """Set up the server for settings (default: read from SETTINGS_FILE once)."""
+    settings = settings or Settings.load()
+    # which tiles each roll of the in-app dice can claim, read once from a cache file
+    dice.load_table(dice_and_rule_values, os.environ.get("DICE_TABLE", dice.DEFAULT_PATH))
+    for value in dice_and_rule_values:
+        tile_info(value, settings.palette)
 
-                    with tile:
-                        fs = dice_fs if is_dice_face(v) else text_fs
-                        ui.label(dice_string_to_faces(v)).style(
-                            f"position:absolute; left:10px; top:10px; font-size:{fs}; font-weight:bold;"
-                        )
-                        with ui.element("div").style(
-                            f"position:absolute; bottom:10px; right:10px; width:{badge_size}; height:{badge_size}; "
-                            "background:white; border-radius:50%; border:2px solid grey; "
-                            "display:flex;align-items:center;justify-content:center;"
-                        ):
-                            ui.label(str(pts)).style(
-                                f"font-size:{pts_fs}; font-weight:bold;"
-                            )
+    server = Server(settings)
+    for sessions, checkpoints in server.stores:
+        checkpoints.restore(sessions)
+    app.timer(CHECKPOINT_INTERVAL, server.save_checkpoint, immediate=False)
+    app.on_shutdown(server.close)
+    metrics.instrument_socketio(core.sio, server.telemetry)
 
-        ui.button("⚙ Setup", on_click=setup_dialog.open).props("flat dense")
+    add_metrics_routes(server)
+    add_api_routes(server)
+    add_pages(server)
+    return server
 
 
-# ---------------- Final Page Layout ------------------------
+def main():
+    create_app()
+    # no auto-reload: it would run a file watcher and import everything twice
+    ui.run(
+        host="0.0.0.0",
+        port=int(os.environ.get("PORT", "8080")),
+        storage_secret=storage_secret(),
+        reload=False,
+    )
 
-with ui.column().classes("items-center").style(
-    "width:100%; min-height:100vh; justify-content:center;"
-):
-    with ui.row().classes("items-start justify-center").style(
-        "gap:24px; max-width:90vw; margin:auto;"
-    ):
-        left_panel()
-        board()
-        right_panel()
 
-ui.run(host="0.0.0.0", port=8080)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+import argparse
+import asyncio
+import contextlib
+import datetime
+import inspect
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import timeit
+
+from bitboard import BitBoard
+from engine import (
+    GameState,
+    count_tiles,
+    count_total_points,
+    dice_and_rule_values,
+    random_grid,
+)
+
+# ----------------- Benchmarks -------------------------------
+#
+# Times the engine and render hot paths over a range of board sizes and
+# appends one JSON line per run to the results file, so runs can be compared
+# over time (see --compare).
+
+DEFAULT_SIZES = ["4x4", "5x5", "8x8", "16x16", "32x32", "64x64"]
+DEFAULT_RENDER_SIZES = ["4x4", "5x5", "8x8"]
+RESULTS_FILE = "bench_results.jsonl"
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_size(text: str):
+    rows, _, cols = text.lower().partition("x")
+    return int(rows), int(cols or rows)
+
+
+def time_op(fn, repeat: int = 5) -> float:
+    """Best-of-`repeat` time of one call to fn, in microseconds."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def make_game(rows: int, cols: int, fill: float, seed: int = 0) -> GameState:
+    """A game on a rows x cols board (tiles may repeat) with ~fill of it owned."""
+    rng = random.Random(seed)
+    game = GameState(seed=seed)
+    game.rows, game.cols = rows, cols
+    values = list(dice_and_rule_values)
+    game.grid = [[rng.choice(values) for _ in range(cols)] for _ in range(rows)]
+    game.owner = [[None] * cols for _ in range(rows)]
+    game._reset_counters()
+    for r in range(rows):
+        for c in range(cols):
+            if rng.random() < fill:
+                game._claim(r, c, rng.choice(("Player 1", "Player 2")))
+    return game
+
+
+# ----------------- Engine -----------------------------------
+
+
+def bench_engine(rows: int, cols: int) -> dict:
+    game = make_game(rows, cols, fill=0.5)
+    grid, owner = game.grid, game.owner
+    bb = BitBoard.from_state(grid, owner, game.values)
+    results = {
+        "count_total_points": time_op(lambda: count_total_points(grid, owner)),
+        "count_tiles": time_op(lambda: count_tiles(owner)),
+        "has_four_in_line": time_op(lambda: game._has_four_in_line("Player 1")),
+        "check_four_winner": time_op(game._check_four_winner),
+        "bitboard_scores": time_op(bb.scores),
+        "bitboard_has_line": time_op(lambda: bb.has_line(0)),
+    }
+
+    # play + undo on an empty board, so every play is a real placement
+    fresh = make_game(rows, cols, fill=0.0)
+    cells = fresh.free_cells()
+    state = {"i": 0}
+
+    def play_undo():
+        r, c = cells[state["i"] % len(cells)]
+        state["i"] += 1
+        fresh.play(r, c)
+        fresh.undo_last()
+
+    results["play_undo"] = time_op(play_undo)
+
+    values = list(dice_and_rule_values)
+    rng = random.Random(0)
+    results["random_grid"] = time_op(lambda: random_grid(values, rows, cols, rng))
+
+    try:
+        import vectorized
+    except ImportError:  # numpy not installed
+        return results
+    points, owner_arr = vectorized.points_array(grid), vectorized.owner_array(owner)
+    results["numpy_scores"] = time_op(lambda: vectorized.scores(points, owner_arr))
+    results["numpy_line_winner"] = time_op(lambda: vectorized.line_winner(owner_arr))
+    return results
+
+
+# ----------------- Render -----------------------------------
+
+
+def payload_bytes(elements) -> int:
+    return sum(len(json.dumps(e._to_dict(), default=str)) for e in elements)
+
+
+async def _bench_render() -> dict:
+    from nicegui import ui
+    from nicegui.testing import user_simulation
+
+    async with user_simulation(main_file=os.path.join(HERE, "app.py")) as user:
+        started = timeit.default_timer()
+        await user.open("/?room=bench")
+        build_ms = (timeit.default_timer() - started) * 1e3
+        client = user.client
+        elements = list(client.elements.values())
+        page_bytes = payload_bytes(elements)
+
+        tiles = sorted(
+            (
+                e
+                for e in user.find(kind=ui.element).elements
+                if e._style.get("cursor") == "pointer"
+            ),
+            key=lambda e: e.id,
+        )
+        client.outbox.updates.clear()
+        started = timeit.default_timer()
+        for listener in tiles[0]._event_listeners.values():
+            result = listener.handler()
+            if inspect.isawaitable(result):
+                await result
+        # input is flushed to the page at most once per frame; wait for it
+        deadline = started + 1.0
+        while not client.outbox.updates and timeit.default_timer() < deadline:
+            await asyncio.sleep(0.001)
+        move_ms = (timeit.default_timer() - started) * 1e3
+        move_bytes = payload_bytes(client.outbox.updates.values())
+
+    return {
+        "page_build_ms": build_ms,
+        "page_payload_bytes": page_bytes,
+        "page_elements": len(elements),
+        "move_ms": move_ms,
+        "move_payload_bytes": move_bytes,
+    }
+
+
+def bench_render(rows: int, cols: int) -> dict:
+    """Build the page for a rows x cols board in a simulated client."""
+    # app.py reads game_settings.json from the working directory
+    with tempfile.TemporaryDirectory() as tmp, contextlib.chdir(tmp):
+        with open("game_settings.json", "w", encoding="utf-8") as f:
+            json.dump({"board": {"rows": rows, "cols": cols}}, f)
+        # NiceGUI's user simulation only resets cleanly when it believes it
+        # runs under pytest
+        os.environ["PYTEST_CURRENT_TEST"] = "bench.py::render"
+        try:
+            return asyncio.run(_bench_render())
+        finally:
+            os.environ.pop("PYTEST_CURRENT_TEST", None)
+
+
+# ----------------- Runner -----------------------------------
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=HERE,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run(sizes, render_sizes) -> dict:
+    run_info = {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "engine_us": {},
+        "render": {},
+    }
+    for size in sizes:
+        run_info["engine_us"][size] = bench_engine(*parse_size(size))
+        print_section(f"engine {size} (us/op)", run_info["engine_us"][size])
+    for size in render_sizes:
+        try:
+            run_info["render"][size] = bench_render(*parse_size(size))
+        except Exception as e:
+            run_info["render"][size] = {"error": repr(e)}
+        print_section(f"render {size}", run_info["render"][size])
+    return run_info
+
+
+def print_section(title: str, results: dict, baseline: dict | None = None):
+    print(title, file=sys.stderr)
+    for name, value in results.items():
+        if isinstance(value, float):
+            line = f"  {name:<22} {value:>12.3f}"
+        else:
+            line = f"  {name:<22} {value!s:>12}"
+        old = (baseline or {}).get(name)
+        if isinstance(value, (int, float)) and isinstance(old, (int, float)) and old:
+            line += f"   x{value / old:5.2f} vs baseline"
+        print(line, file=sys.stderr)
+
+
+def load_runs(path: str) -> list:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare(path: str):
+    """Print the last run in path against the one before it."""
+    runs = load_runs(path)
+    if len(runs) < 2:
+        sys.exit(f"need at least two runs in {path} to compare")
+    old, new = runs[-2], runs[-1]
+    print(f"{old['commit'] or '?'} -> {new['commit'] or '?'}", file=sys.stderr)
+    for section in ("engine_us", "render"):
+        for size, results in new[section].items():
+            print_section(f"{section} {size}", results, old[section].get(size))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Engine and render benchmarks")
+    parser.add_argument("--sizes", nargs="*", default=DEFAULT_SIZES, help="e.g. 4x4 16x16")
+    parser.add_argument(
+        "--render-sizes",
+        nargs="*",
+        default=DEFAULT_RENDER_SIZES,
+        help="board sizes for the NiceGUI render benchmark (none to skip)",
+    )
+    parser.add_argument("--output", default=RESULTS_FILE, help="JSON lines file to append to")
+    parser.add_argument(
+        "--compare", action="store_true", help="compare the last two runs in --output and exit"
+    )
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(args.output)
+        return
+
+    result = run(args.sizes, args.render_sizes)
+    with open(args.output, "a", encoding="utf-8") as f:
+        f.write(json.dumps(result) + "\n")
+    print(f"results appended to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
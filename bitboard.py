@@ -0,0 +1,158 @@
+from functools import lru_cache
+
+# ----------------- Bitboard engine --------------------------
+#
+# Compact board for search and simulation. Each player's tiles are one int:
+# bit (r * cols + c) is set when that player owns cell (r, c). Win checks
+# compare against precomputed line masks and the adjacency bonus is counted
+# with shift-and-popcount, so nothing here walks the board cell by cell.
+
+PLAYERS = ("Player 1", "Player 2")
+LINE_LENGTH = 4
+
+
+class Geometry:
+    """Masks that only depend on the board size, shared by all boards."""
+
+    __slots__ = (
+        "rows",
+        "cols",
+        "size",
+        "full",
+        "not_first_col",
+        "not_last_col",
+        "lines",
+        "lines_through",
+    )
+
+    def __init__(self, rows: int, cols: int, length: int = LINE_LENGTH):
+        self.rows = rows
+        self.cols = cols
+        self.size = rows * cols
+        self.full = (1 << self.size) - 1
+
+        first = last = 0
+        for r in range(rows):
+            first |= 1 << (r * cols)
+            last |= 1 << (r * cols + cols - 1)
+        self.not_first_col = self.full & ~first
+        self.not_last_col = self.full & ~last
+
+        lines = []
+        for r in range(rows):
+            for c in range(cols):
+                for dr, dc in ((1, 0), (0, 1), (1, 1), (1, -1)):
+                    er, ec = r + dr * (length - 1), c + dc * (length - 1)
+                    if not (0 <= er < rows and 0 <= ec < cols):
+                        continue
+                    mask = 0
+                    for k in range(length):
+                        mask |= 1 << ((r + dr * k) * cols + c + dc * k)
+                    lines.append(mask)
+        self.lines = tuple(lines)
+        self.lines_through = tuple(
+            tuple(m for m in lines if m >> i & 1) for i in range(self.size)
+        )
+
+
+@lru_cache(maxsize=None)
+def geometry(rows: int, cols: int, length: int = LINE_LENGTH) -> Geometry:
+    return Geometry(rows, cols, length)
+
+
+def has_line(mask: int, geo: Geometry) -> bool:
+    for line in geo.lines:
+        if mask & line == line:
+            return True
+    return False
+
+
+def line_through(mask: int, cell: int, geo: Geometry) -> bool:
+    """Does mask contain a full line passing through cell?"""
+    for line in geo.lines_through[cell]:
+        if mask & line == line:
+            return True
+    return False
+
+
+def adjacency_pairs(mask: int, geo: Geometry) -> int:
+    """Number of 8-neighbour pairs inside mask (the adjacency bonus)."""
+    cols = geo.cols
+    return (
+        (mask & (mask >> 1) & geo.not_last_col).bit_count()
+        + (mask & (mask >> cols)).bit_count()
+        + (mask & (mask >> (cols + 1)) & geo.not_last_col).bit_count()
+        + (mask & (mask >> (cols - 1)) & geo.not_first_col).bit_count()
+    )
+
+
+class BitBoard:
+    """Ownership of both players as two bitmasks plus per-cell tile points."""
+
+    __slots__ = ("geo", "points", "masks")
+
+    def __init__(self, rows: int, cols: int, points=None):
+        self.geo = geometry(rows, cols)
+        self.points = tuple(points) if points is not None else (0,) * self.geo.size
+        self.masks = [0, 0]
+
+    @classmethod
+    def from_state(cls, grid, owner, values: dict) -> "BitBoard":
+        """Build from a GameState-style grid/owner matrix."""
+        rows, cols = len(grid), len(grid[0])
+        bb = cls(rows, cols, [values.get(v, 0) for row in grid for v in row])
+        for r in range(rows):
+            for c in range(cols):
+                if owner[r][c] is not None:
+                    bb.masks[PLAYERS.index(owner[r][c])] |= 1 << (r * cols + c)
+        return bb
+
+    def copy(self) -> "BitBoard":
+        bb = BitBoard.__new__(BitBoard)
+        bb.geo = self.geo
+        bb.points = self.points
+        bb.masks = self.masks[:]
+        return bb
+
+    # ---- moves ----
+
+    @property
+    def free(self) -> int:
+        return self.geo.full & ~(self.masks[0] | self.masks[1])
+
+    def claim(self, cell: int, player: int):
+        self.masks[player] |= 1 << cell
+
+    def release(self, cell: int, player: int):
+        self.masks[player] &= ~(1 << cell)
+
+    # ---- evaluation ----
+
+    def has_line(self, player: int) -> bool:
+        return has_line(self.masks[player], self.geo)
+
+    def line_through(self, cell: int, player: int) -> bool:
+        return line_through(self.masks[player], cell, self.geo)
+
+    def adjacency(self, player: int) -> int:
+        return adjacency_pairs(self.masks[player], self.geo)
+
+    def base(self, player: int) -> int:
+        mask = self.masks[player]
+        points = self.points
+        total = 0
+        while mask:
+            low = mask & -mask
+            total += points[low.bit_length() - 1]
+            mask ^= low
+        return total
+
+    def score(self, player: int) -> int:
+        return self.base(player) + self.adjacency(player)
+
+    def scores(self):
+        return self.score(0), self.score(1)
+
+    def key(self):
+        """Hashable ownership key, e.g. for transposition tables."""
+        return self.masks[0], self.masks[1]
@@ -0,0 +1,237 @@
+import time
+
+from engine import GameState
+from policies import marginal_gain
+
+# ----------------- Search bot -------------------------------
+#
+# Negamax alpha-beta over GameState.play / pass_turn / undo_last with a
+# transposition table and iterative deepening inside a time budget.
+# Turns do not strictly alternate (the 21+ rule hands out a last turn), so
+# a child is only negated when the side to move actually changes.
+
+WIN = 10_000
+EXACT, LOWER, UPPER = 0, 1, 2
+PASS = None
+
+DEFAULT_TIME_BUDGET = 1.0  # seconds per move
+DEFAULT_TT_SIZE = 1_000_000  # entries before the table is cleared
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class SearchResult:
+    __slots__ = ("move", "value", "depth", "nodes", "seconds")
+
+    def __init__(self, move, value, depth, nodes, seconds):
+        self.move = move  # (row, col) or None for pass
+        self.value = value  # from the point of view of the side to move
+        self.depth = depth  # deepest fully searched depth
+        self.nodes = nodes
+        self.seconds = seconds
+
+    @property
+    def nodes_per_second(self) -> float:
+        return self.nodes / self.seconds if self.seconds else 0.0
+
+    def __repr__(self):
+        return (
+            f"SearchResult(move={self.move}, value={self.value}, depth={self.depth}, "
+            f"nodes={self.nodes}, nps={self.nodes_per_second:,.0f})"
+        )
+
+
+def rules_key(game: GameState) -> int:
+    """Identifies the grid and house rules, so one table can serve many games."""
+    return hash(
+        (
+            tuple(map(tuple, game.grid)),
+            tuple(sorted(game.values.items())),
+            game.point_limit,
+            game.round_limit,
+        )
+    )
+
+
+def position_key(game: GameState, context: int = 0):
+    """Ownership bitmasks + rounds + whose turn + pending last turn + dice roll."""
+    p1 = p2 = 0
+    bit = 1
+    for row in game.owner:
+        for cell in row:
+            if cell == "Player 1":
+                p1 |= bit
+            elif cell == "Player 2":
+                p2 |= bit
+            bit <<= 1
+    return (
+        context,
+        p1,
+        p2,
+        game.rounds["Player 1"],
+        game.rounds["Player 2"],
+        game.player,
+        game.pending_last_turn_for,
+        game.roll,  # a roll limits the moves of the player to move
+    )
+
+
+def remaining_turns(game: GameState) -> int:
+    return sum(max(0, game.round_limit - n) for n in game.rounds.values())
+
+
+class Searcher:
+    def __init__(self, time_budget: float = DEFAULT_TIME_BUDGET, max_depth=None, tt=None):
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.tt = tt if tt is not None else {}
+        self.nodes = 0
+        self.deadline = 0.0
+        self.context = 0
+
+    def search(self, game: GameState) -> SearchResult:
+        """Best move for game.player. The game is copied, never mutated."""
+        game = game.copy()
+        if len(self.tt) > DEFAULT_TT_SIZE:
+            self.tt.clear()
+
+        started = time.perf_counter()
+        self.deadline = started + self.time_budget
+        self.nodes = 0
+        self.context = rules_key(game)
+
+        limit = remaining_turns(game)
+        if self.max_depth is not None:
+            limit = min(limit, self.max_depth)
+
+        moves = self._ordered_moves(game, None)
+        best = SearchResult(moves[0], 0, 0, 0, 0.0)
+        for depth in range(1, max(limit, 1) + 1):
+            try:
+                value, move = self._root(game, depth)
+            except SearchTimeout:
+                break
+            best = SearchResult(move, value, depth, 0, 0.0)
+            if abs(value) >= WIN:
+                break  # forced result found, deeper search changes nothing
+
+        best.nodes = self.nodes
+        best.seconds = time.perf_counter() - started
+        return best
+
+    # ---- internals ----
+
+    def _ordered_moves(self, game: GameState, first):
+        me = game.player
+        cells = sorted(
+            game.claimable(),
+            key=lambda rc: marginal_gain(game, rc[0], rc[1], me),
+            reverse=True,
+        )
+        moves = cells + [PASS]
+        if first in moves and moves[0] != first:
+            moves.remove(first)
+            moves.insert(0, first)
+        return moves
+
+    def _apply(self, game: GameState, move) -> bool:
+        """Make move; False if the rules refused it, so there is nothing to undo."""
+        before = len(game.history)
+        if move is PASS:
+            game.pass_turn()
+        else:
+            game.play(*move)
+        return len(game.history) > before
+
+    def _child(self, game: GameState, me: str, depth: int, alpha: int, beta: int) -> int:
+        if game.game_over or game.player == me:
+            return self._negamax(game, depth, alpha, beta)
+        return -self._negamax(game, depth, -beta, -alpha)
+
+    def _root(self, game: GameState, depth: int):
+        key = position_key(game, self.context)
+        entry = self.tt.get(key)
+        me = game.player
+        alpha, beta = -WIN * 2, WIN * 2
+        best_value, best_move = -WIN * 2, None
+        # undo does not bring a dice roll back, and only the root can have one
+        roll, rerolls_left = game.roll, game.rerolls_left
+        for move in self._ordered_moves(game, entry[3] if entry else None):
+            if not self._apply(game, move):
+                continue
+            value = self._child(game, me, depth - 1, alpha, beta)
+            game.undo_last()
+            game.roll, game.rerolls_left = roll, rerolls_left
+            if value > best_value:
+                best_value, best_move = value, move
+            alpha = max(alpha, value)
+        self.tt[key] = (depth, best_value, EXACT, best_move)
+        return best_value, best_move
+
+    def _evaluate(self, game: GameState) -> int:
+        me = game.player
+        if game.game_over:
+            if game.winner is None:
+                return 0
+            # prefer quick wins and slow losses
+            bonus = remaining_turns(game)
+            return WIN + bonus if game.winner == me else -WIN - bonus
+        p1, p2 = game.scores()
+        return p1 - p2 if me == "Player 1" else p2 - p1
+
+    def _negamax(self, game: GameState, depth: int, alpha: int, beta: int) -> int:
+        self.nodes += 1
+        if self.nodes & 1023 == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout
+
+        if game.game_over or depth <= 0:
+            return self._evaluate(game)
+
+        key = position_key(game, self.context)
+        entry = self.tt.get(key)
+        tt_move = None
+        if entry is not None:
+            e_depth, e_value, e_flag, tt_move = entry
+            if e_depth >= depth:
+                if e_flag == EXACT:
+                    return e_value
+                if e_flag == LOWER:
+                    alpha = max(alpha, e_value)
+                else:
+                    beta = min(beta, e_value)
+                if alpha >= beta:
+                    return e_value
+
+        alpha_orig = alpha
+        me = game.player
+        best_value, best_move = -WIN * 2, None
+        for move in self._ordered_moves(game, tt_move):
+            if not self._apply(game, move):
+                continue
+            value = self._child(game, me, depth - 1, alpha, beta)
+            game.undo_last()
+            if value > best_value:
+                best_value, best_move = value, move
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        if best_value <= alpha_orig:
+            flag = UPPER
+        elif best_value >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.tt[key] = (depth, best_value, flag, best_move)
+        return best_value
+
+
+# one table per process, so a worker reuses what it learned on earlier moves
+_shared_tt: dict = {}
+
+
+def best_move(game: GameState, time_budget: float = DEFAULT_TIME_BUDGET) -> SearchResult:
+    """Entry point for worker processes (e.g. nicegui.run.cpu_bound)."""
+    return Searcher(time_budget, tt=_shared_tt).search(game)
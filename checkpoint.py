@@ -0,0 +1,462 @@
+import json
+import logging
+import os
+import random
+import struct
+import zlib
+
+from engine import PASS, PLAY, REMOVE, dice_and_rule_values
+from persistence import write_bytes_atomic
+
+log = logging.getLogger(__name__)
+
+# ----------------- Crash-safe checkpoints -------------------
+#
+# Live games survive a restart through two kinds of files:
+#
+# * the checkpoint: every session's game in a compact binary encoding,
+#   rewritten atomically every few seconds. Only sessions that changed since
+#   the last checkpoint are encoded again.
+# * journals: append-only logs of the moves made since a checkpoint, one
+#   small CRC-framed record per move.
+#
+# Every checkpoint starts a new journal generation and deletes the older
+# ones once it is on disk. On startup the checkpoint is decoded and only the
+# short journal tail is re-applied, so no game is replayed from its start.
+
+DEFAULT_PATH = "sessions.ckpt"
+MAGIC = b"PKCP"
+VERSION = 1
+
+PLAYERS = (None, "Player 1", "Player 2")
+PLAYER_CODES = {p: i for i, p in enumerate(PLAYERS)}
+KINDS = (PLAY, PASS, REMOVE)
+KIND_CODES = {k: i for i, k in enumerate(KINDS)}
+NO_CELL = 0xFFFF  # row/col of a pass
+
+# journal operations
+OP_SNAPSHOT, OP_MOVE, OP_UNDO, OP_REDO, OP_DROP = range(5)
+
+_FRAME = struct.Struct("<II")  # payload length, crc32
+
+
+# ----------------- Binary encoding --------------------------
+
+
+class _Writer:
+    __slots__ = ("buf",)
+
+    def __init__(self):
+        self.buf = bytearray()
+
+    def pack(self, fmt: str, *values):
+        self.buf += struct.pack("<" + fmt, *values)
+
+    def text(self, value: str):
+        data = value.encode("utf-8")
+        self.pack("I", len(data))
+        self.buf += data
+
+    def blob(self, data: bytes):
+        self.pack("I", len(data))
+        self.buf += data
+
+
+class _Reader:
+    __slots__ = ("data", "pos")
+
+    def __init__(self, data: bytes, pos: int = 0):
+        self.data = data
+        self.pos = pos
+
+    def unpack(self, fmt: str):
+        fmt = "<" + fmt
+        values = struct.unpack_from(fmt, self.data, self.pos)
+        self.pos += struct.calcsize(fmt)
+        return values
+
+    def one(self, fmt: str):
+        return self.unpack(fmt)[0]
+
+    def blob(self) -> bytes:
+        n = self.one("I")
+        if self.pos + n > len(self.data):
+            raise ValueError("truncated record")
+        data = bytes(self.data[self.pos:self.pos + n])
+        self.pos += n
+        return data
+
+    def text(self) -> str:
+        return self.blob().decode("utf-8")
+
+
+def _cell(value) -> int:
+    return NO_CELL if value is None else value
+
+
+def _uncell(value: int):
+    return None if value == NO_CELL else value
+
+
+def _write_end(w: _Writer, end):
+    game_over, winner, reason, pending = end
+    w.pack("BBB", game_over, PLAYER_CODES[winner], PLAYER_CODES[pending])
+    w.text(reason)
+
+
+def _read_end(r: _Reader):
+    game_over, winner, pending = r.unpack("BBB")
+    return bool(game_over), PLAYERS[winner], r.text(), PLAYERS[pending]
+
+
+def encode_game(game, extra_attrs=()) -> bytes:
+    """Pack a GameState into bytes.
+
+    Tiles are stored once in a table and referenced per cell, owners take two
+    bits per cell and history entries a few bytes each. extra_attrs names
+    JSON-friendly attributes of a subclass (display settings) to keep too.
+    """
+    w = _Writer()
+    w.pack("HHHHQ", game.rows, game.cols, game.point_limit, game.round_limit, game.seed)
+
+    rules = {}
+    if game.values is not dice_and_rule_values:
+        rules["values"] = game.values
+    if game.tile_weights is not None:
+        rules["tile_weights"] = game.tile_weights
+    w.text(json.dumps(rules, ensure_ascii=False) if rules else "")
+
+    tiles = list(dict.fromkeys(v for row in game.grid for v in row))
+    index = {t: i for i, t in enumerate(tiles)}
+    w.pack("H", len(tiles))
+    for tile in tiles:
+        w.text(tile)
+    cell_fmt = "B" if len(tiles) <= 256 else "H"
+    cells = [index[v] for row in game.grid for v in row]
+    w.pack(f"{len(cells)}{cell_fmt}", *cells)
+
+    owners = bytearray((game.rows * game.cols + 3) // 4)
+    for i, owner in enumerate(o for row in game.owner for o in row):
+        owners[i >> 2] |= PLAYER_CODES[owner] << ((i & 3) * 2)
+    w.buf += owners
+
+    w.pack("BHH", PLAYER_CODES[game.player], game.rounds["Player 1"], game.rounds["Player 2"])
+    _write_end(w, game._end_state())
+
+    w.pack("I", len(game.history))
+    for kind, r, c, mover, end_before in game.history:
+        w.pack("BHHBB", KIND_CODES[kind], _cell(r), _cell(c), PLAYER_CODES[mover], end_before is not None)
+        if end_before is not None:
+            _write_end(w, end_before)
+    w.pack("I", len(game.redo_stack))
+    for kind, r, c in game.redo_stack:
+        w.pack("BHH", KIND_CODES[kind], _cell(r), _cell(c))
+
+    extra = {name: getattr(game, name) for name in extra_attrs if hasattr(game, name)}
+    w.text(json.dumps(extra, ensure_ascii=False) if extra else "")
+    return bytes(w.buf)
+
+
+def decode_into(game, data: bytes) -> None:
+    """Overwrite game's state with an encode_game() result."""
+    r = _Reader(data)
+    rows, cols, game.point_limit, game.round_limit, seed = r.unpack("HHHHQ")
+    rules = r.text()
+    rules = json.loads(rules) if rules else {}
+    game.values = rules.get("values", dice_and_rule_values)
+    game.tile_weights = rules.get("tile_weights")
+
+    tiles = [r.text() for _ in range(r.one("H"))]
+    cell_fmt = "B" if len(tiles) <= 256 else "H"
+    cells = r.unpack(f"{rows * cols}{cell_fmt}")
+    owners = r.data[r.pos:r.pos + (rows * cols + 3) // 4]
+    r.pos += len(owners)
+
+    game.rows, game.cols = rows, cols
+    game.seed = seed
+    game.rng = random.Random(seed)
+    game.grid = [[tiles[cells[i * cols + c]] for c in range(cols)] for i in range(rows)]
+    game.owner = [[None] * cols for _ in range(rows)]
+    game._reset_counters()
+    for i in range(rows * cols):
+        owner = PLAYERS[(owners[i >> 2] >> ((i & 3) * 2)) & 3]
+        if owner is not None:
+            game._claim(i // cols, i % cols, owner)
+
+    player, p1_rounds, p2_rounds = r.unpack("BHH")
+    game.player = PLAYERS[player]
+    game.rounds = {"Player 1": p1_rounds, "Player 2": p2_rounds}
+    game.game_over, game.winner, game.win_reason, game.pending_last_turn_for = _read_end(r)
+
+    game.history = []
+    for _ in range(r.one("I")):
+        kind, row, col, mover, has_end = r.unpack("BHHBB")
+        end_before = _read_end(r) if has_end else None
+        game.history.append((KINDS[kind], _uncell(row), _uncell(col), PLAYERS[mover], end_before))
+    game.redo_stack = []
+    for _ in range(r.one("I")):
+        kind, row, col = r.unpack("BHH")
+        game.redo_stack.append((KINDS[kind], _uncell(row), _uncell(col)))
+    game._redoing = False
+
+    extra = r.text()
+    for name, value in (json.loads(extra) if extra else {}).items():
+        setattr(game, name, value)
+
+
+# ----------------- Journal ----------------------------------
+
+
+def read_journal(path: str):
+    """Yield (key, op, body) records; stops at a torn or corrupt tail."""
+    with open(path, "rb") as f:
+        data = f.read()
+    pos = 0
+    while pos + _FRAME.size <= len(data):
+        length, crc = _FRAME.unpack_from(data, pos)
+        payload = data[pos + _FRAME.size:pos + _FRAME.size + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            log.warning("ignoring torn journal tail in %s at byte %d", path, pos)
+            return
+        r = _Reader(payload)
+        key = r.text()
+        op = r.one("B")
+        yield key, op, payload[r.pos:]
+        pos += _FRAME.size + length
+
+
+def _move_body(move) -> bytes:
+    kind, r, c = move
+    return struct.pack("<BHH", KIND_CODES[kind], _cell(r), _cell(c))
+
+
+def _read_move(body: bytes):
+    kind, r, c = struct.unpack("<BHH", body)
+    return KINDS[kind], _uncell(r), _uncell(c)
+
+
+# ----------------- Checkpointer -----------------------------
+
+
+class Checkpointer:
+    """Checkpoints and journals the games of a SessionStore.
+
+    Call note() after every change to a session's game, prepare() + write()
+    periodically (write() may run on a worker thread), and restore() once on
+    startup.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, extra_attrs=()):
+        self.path = path
+        self.extra_attrs = tuple(extra_attrs)
+        self.generation = 0  # journal generation being appended to
+        self.last_error: Exception | None = None
+
+        self._blobs: dict[str, bytes] = {}  # encoded games as of the last prepare()
+        self._dirty: set[str] = set()
+        self._marks: dict[str, tuple] = {}  # what note() last saw of each game
+        self._journal = None
+        self._stale = False  # blobs differ from the checkpoint on disk
+        self._writing = False
+
+    def _journal_path(self, generation: int) -> str:
+        return f"{self.path}.{generation}.journal"
+
+    def _journal_generations(self) -> list:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        prefix = os.path.basename(self.path) + "."
+        found = []
+        for name in os.listdir(directory):
+            if name.startswith(prefix) and name.endswith(".journal"):
+                middle = name[len(prefix):-len(".journal")]
+                if middle.isdigit():
+                    found.append(int(middle))
+        return sorted(found)
+
+    # ---- journal ----
+
+    @staticmethod
+    def _mark(game) -> tuple:
+        redo = game.redo_stack
+        return (id(game.grid), len(game.history), len(redo), redo[-1] if redo else None)
+
+    def note(self, key: str, game) -> None:
+        """Journal what changed in game since the last note() for key.
+
+        A single move, undo or redo becomes a few bytes; anything else (a new
+        board, settings, several steps at once) a full snapshot.
+        """
+        mark = self._mark(game)
+        old = self._marks.get(key)
+        self._marks[key] = mark
+        self._dirty.add(key)
+
+        op, body = OP_SNAPSHOT, b""
+        if old is not None and old[0] == mark[0]:
+            grown = mark[1] - old[1]
+            if grown == 1 and mark[2] == old[2] - 1 and game.history[-1][:3] == old[3]:
+                op = OP_REDO
+            elif grown == 1 and mark[2] == 0:
+                op, body = OP_MOVE, _move_body(game.history[-1][:3])
+            elif grown == -1 and mark[2] == old[2] + 1:
+                op = OP_UNDO
+        if op == OP_SNAPSHOT:
+            body = self._encode(key, game)
+            if body is None:
+                return
+        self._append(key, op, body)
+
+    def _encode(self, key: str, game):
+        """encode_game(), or None (logged) for a game that cannot be encoded.
+
+        One bad game must not stop every other game from being saved.
+        """
+        try:
+            return encode_game(game, self.extra_attrs)
+        except (struct.error, TypeError, ValueError, KeyError) as e:
+            self.last_error = e
+            log.warning("not checkpointing %s: %s", key, e)
+            return None
+
+    def forget(self, key: str) -> None:
+        """The session is gone (evicted); drop it from future checkpoints."""
+        self._blobs.pop(key, None)
+        self._marks.pop(key, None)
+        self._dirty.discard(key)
+        self._stale = True
+        self._append(key, OP_DROP, b"")
+
+    def _append(self, key: str, op: int, body: bytes):
+        w = _Writer()
+        w.text(key)
+        w.pack("B", op)
+        payload = bytes(w.buf) + body
+        try:
+            if self._journal is None:
+                self._journal = open(self._journal_path(self.generation), "ab")
+            self._journal.write(_FRAME.pack(len(payload), zlib.crc32(payload)) + payload)
+            # reaching the OS is enough to survive a process crash or restart
+            self._journal.flush()
+        except OSError as e:
+            self.last_error = e
+            log.warning("could not append to journal %s: %s", self.path, e)
+
+    def _close_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    # ---- checkpoints ----
+
+    def prepare(self, sessions):
+        """Encode changed games and start a new journal generation.
+
+        Runs on the thread that changes the games. Returns what write()
+        needs, or None when nothing changed since the last checkpoint.
+        """
+        if self._writing or not (self._dirty or self._stale):
+            return None
+        for session in sessions:
+            if session.key in self._dirty or session.key not in self._blobs:
+                blob = self._encode(session.key, session.game)
+                if blob is not None:
+                    self._blobs[session.key] = blob
+        self._dirty.clear()
+        self._stale = False
+        self._close_journal()
+        self.generation += 1
+        self._writing = True
+        return self.generation, list(self._blobs.items())
+
+    def write(self, prepared) -> None:
+        """Write a prepare() result to disk and delete the journals it covers."""
+        generation, blobs = prepared
+        try:
+            w = _Writer()
+            w.buf += MAGIC
+            w.pack("BQI", VERSION, generation, len(blobs))
+            for key, blob in blobs:
+                w.text(key)
+                w.blob(blob)
+            w.pack("I", zlib.crc32(w.buf))
+            write_bytes_atomic(self.path, bytes(w.buf))
+            for old in self._journal_generations():
+                if old < generation:
+                    os.unlink(self._journal_path(old))
+        except Exception as e:
+            self.last_error = e
+            self._stale = True  # try again next time; the old journals stay
+            log.warning("could not write checkpoint %s: %s", self.path, e)
+        else:
+            self.last_error = None
+        finally:
+            self._writing = False
+
+    def checkpoint(self, sessions) -> None:
+        """prepare() + write() in one go, e.g. on shutdown."""
+        prepared = self.prepare(sessions)
+        if prepared is not None:
+            self.write(prepared)
+        self._close_journal()
+
+    def _read_checkpoint(self) -> tuple:
+        with open(self.path, "rb") as f:
+            data = f.read()
+        if data[:4] != MAGIC:
+            raise ValueError("not a checkpoint file")
+        (crc,) = struct.unpack_from("<I", data, len(data) - 4)
+        if zlib.crc32(data[:-4]) != crc:
+            raise ValueError("checksum mismatch")
+        r = _Reader(data, 4)
+        version, generation, count = r.unpack("BQI")
+        if version != VERSION:
+            raise ValueError(f"unsupported version {version}")
+        return generation, [(r.text(), r.blob()) for _ in range(count)]
+
+    def restore(self, sessions) -> int:
+        """Load the last checkpoint plus journals into sessions.
+
+        sessions is a SessionStore; games are created through it. Returns how
+        many sessions were restored.
+        """
+        generation, entries = 0, []
+        if os.path.exists(self.path):
+            try:
+                generation, entries = self._read_checkpoint()
+            except Exception as e:
+                log.warning("ignoring unreadable checkpoint %s: %s", self.path, e)
+
+        for key, blob in entries:
+            decode_into(sessions.get(key).game, blob)
+
+        for gen in self._journal_generations():
+            if gen < generation:
+                continue
+            try:
+                self._replay(sessions, self._journal_path(gen))
+            except Exception as e:
+                log.warning("stopped replaying journal %s: %s", self._journal_path(gen), e)
+            generation = max(generation, gen)
+
+        # consolidate into a fresh checkpoint so the journals can go
+        self.generation = generation
+        for session in sessions:
+            self._marks[session.key] = self._mark(session.game)
+            self._dirty.add(session.key)
+        self.checkpoint(sessions)
+        return len(sessions)
+
+    def _replay(self, sessions, path: str):
+        for key, op, body in read_journal(path):
+            if op == OP_SNAPSHOT:
+                decode_into(sessions.get(key).game, body)
+            elif op == OP_DROP:
+                sessions.drop(key)
+            elif key in sessions:
+                game = sessions.get(key).game
+                if op == OP_MOVE:
+                    game.apply(_read_move(body))
+                elif op == OP_UNDO:
+                    game.undo_last()
+                elif op == OP_REDO:
+                    game.redo()
@@ -0,0 +1,174 @@
+import itertools
+import json
+import random
+from collections import Counter
+
+from persistence import write_json_atomic
+
+# ----------------- Dice -------------------------------------
+#
+# Five six-sided dice decide which tiles a player may claim. There are only
+# 252 distinct rolls once order is ignored, so every roll is mapped ahead of
+# time to a bitmask of the tile rules it satisfies (one bit per rule key)
+# and checking a claim is one dict lookup and one AND.
+#
+# Rolls are sorted tuples, e.g. (1, 2, 2, 5, 6).
+
+DICE = 5
+FACES = 6
+REROLLS = 2  # after the first roll of a turn
+DEFAULT_PATH = "dice_table.json"
+VERSION = 1
+
+
+def _of_a_kind(face: int, n: int):
+    return lambda counts, total: counts[face] >= n
+
+
+def _straight(length: int):
+    runs = [set(range(a, a + length)) for a in range(1, FACES - length + 2)]
+    return lambda counts, total: any(run <= counts.keys() for run in runs)
+
+
+def _shape(*sizes):
+    """Distinct faces showing at least each of sizes, e.g. (3, 2) for A A A  B B."""
+
+    def check(counts, total):
+        have = sorted(counts.values(), reverse=True)
+        return len(have) >= len(sizes) and all(h >= s for h, s in zip(have, sizes))
+
+    return check
+
+
+# rule key -> predicate over (Counter of faces, sum of the dice)
+RULES = {
+    **{f"{f} {f}": _of_a_kind(f, 2) for f in range(1, FACES + 1)},
+    **{f"{f} {f} {f}": _of_a_kind(f, 3) for f in range(1, FACES + 1)},
+    "<= 9": lambda counts, total: total <= 9,
+    ">= 26": lambda counts, total: total >= 26,
+    "12 / 13 / 14": lambda counts, total: 12 <= total <= 14,
+    "21 / 22 / 23": lambda counts, total: 21 <= total <= 23,
+    "A A  B B": _shape(2, 2),
+    "A A A  B B": _shape(3, 2),
+    "A A A A": _shape(4),
+    "A A A A A": _shape(5),
+    "A B C D E": lambda counts, total: len(counts) == DICE,
+    "A +1 +2 +3": _straight(4),
+    "A +1 +2 +3 +4": _straight(5),
+    "1, 3, 5": lambda counts, total: {1, 3, 5} <= counts.keys(),
+    "2, 4, 6": lambda counts, total: {2, 4, 6} <= counts.keys(),
+}
+
+
+def satisfies(rule: str, roll) -> bool:
+    """Evaluate one rule directly; tiles without a known rule are always allowed."""
+    check = RULES.get(rule)
+    return check is None or check(Counter(roll), sum(roll))
+
+
+def all_rolls():
+    return itertools.combinations_with_replacement(range(1, FACES + 1), DICE)
+
+
+def roll(rng=random) -> tuple:
+    return tuple(sorted(rng.randint(1, FACES) for _ in range(DICE)))
+
+
+def reroll(current, keep, rng=random) -> tuple:
+    """Keep some dice of current (a sub-multiset) and roll the rest."""
+    rest = Counter(current)
+    rest.subtract(keep)
+    if any(n < 0 for n in rest.values()):
+        raise ValueError(f"cannot keep {keep} from {current}")
+    new = [rng.randint(1, FACES) for _ in range(DICE - len(keep))]
+    return tuple(sorted(list(keep) + new))
+
+
+class RollTable:
+    """Roll -> bitmask of the rule keys it satisfies, for one set of keys."""
+
+    __slots__ = ("keys", "bits", "masks")
+
+    def __init__(self, keys, masks: dict):
+        self.keys = tuple(keys)
+        # keys without a known rule get no bit and are always allowed
+        self.bits = {k: 1 << i for i, k in enumerate(self.keys) if k in RULES}
+        self.masks = masks
+
+    @classmethod
+    def build(cls, keys) -> "RollTable":
+        keys = tuple(keys)
+        masks = {}
+        for r in all_rolls():
+            counts, total = Counter(r), sum(r)
+            mask = 0
+            for i, key in enumerate(keys):
+                check = RULES.get(key)
+                if check is not None and check(counts, total):
+                    mask |= 1 << i
+            masks[r] = mask
+        return cls(keys, masks)
+
+    def allows(self, roll, key: str) -> bool:
+        bit = self.bits.get(key)
+        return bit is None or bool(self.masks[roll] & bit)
+
+    def satisfied(self, roll) -> list:
+        """Rule keys this roll satisfies."""
+        mask = self.masks[roll]
+        return [k for k, bit in self.bits.items() if mask & bit]
+
+
+_tables: dict = {}  # tuple of rule keys -> RollTable
+_by_identity: dict = {}  # id(keys) -> (keys, RollTable), skips re-hashing the keys
+
+
+def table_for(keys) -> RollTable:
+    """The table for these rule keys (e.g. a values dict), built on first use."""
+    if isinstance(keys, tuple):
+        ordered = keys
+    else:
+        hit = _by_identity.get(id(keys))
+        if hit is not None and hit[0] is keys:
+            return hit[1]
+        ordered = tuple(keys)
+    table = _tables.get(ordered)
+    if table is None:
+        table = _tables[ordered] = RollTable.build(ordered)
+    if ordered is not keys:
+        # holding keys keeps its id from being reused
+        _by_identity[id(keys)] = (keys, table)
+    return table
+
+
+def load_table(keys, path: str = DEFAULT_PATH) -> RollTable:
+    """table_for(), read from or saved to a cache file.
+
+    The file is rebuilt when the rule keys or format changed.
+    """
+    keys = tuple(keys)
+    if keys in _tables:
+        return _tables[keys]
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != VERSION or tuple(data.get("keys", ())) != keys:
+            raise ValueError("stale dice table")
+        masks = {
+            tuple(int(d) for d in r.split(",")): mask for r, mask in data["masks"].items()
+        }
+        table = RollTable(keys, masks)
+    except (OSError, ValueError, KeyError):
+        table = RollTable.build(keys)
+        data = {
+            "version": VERSION,
+            "keys": list(keys),
+            "masks": {",".join(map(str, r)): mask for r, mask in table.masks.items()},
+        }
+        try:
+            write_json_atomic(path, data)
+        except OSError:
+            pass  # a read-only directory just means no cache
+    _tables[keys] = table
+    return table
+
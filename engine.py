@@ -0,0 +1,529 @@
+"""Pinakostkada rules engine.
+
+Pure Python with no UI or config side effects, so simulators, bots and
+tests can import it cheaply. The NiceGUI front end in app.py builds on it.
+"""
+
+import copy
+import random
+
+import dice
+
+DEFAULT_ROWS = 4
+DEFAULT_COLS = 4
+POINT_LIMIT = 21  # reaching this gives the opponent one last turn
+ROUND_LIMIT = 6  # turns per player, including passes
+
+# ----------------- Game logic constants ---------------------
+
+# dice-face unicode mapping
+die_face = {
+    "1": "\u2680",
+    "2": "\u2681",
+    "3": "\u2682",
+    "4": "\u2683",
+    "5": "\u2684",
+    "6": "\u2685",
+}
+
+# scoring/rules
+dice_and_rule_values = {
+    # Pairs
+    "1 1": 1,
+    "2 2": 1,
+    "3 3": 1,
+    "4 4": 1,
+    "5 5": 1,
+    "6 6": 1,
+    # Triplets
+    "1 1 1": 1,
+    "2 2 2": 1,
+    "3 3 3": 1,
+    "4 4 4": 1,
+    "5 5 5": 1,
+    "6 6 6": 1,
+    # Specials
+    "<= 9": 2,
+    ">= 26": 2,
+    "12 / 13 / 14": 2,
+    "21 / 22 / 23": 2,
+    "A A  B B": 2,
+    "A A A  B B": 3,
+    "A A A A": 3,
+    "A A A A A": 4,
+    "A B C D E": 3,
+    "A +1 +2 +3": 2,
+    "A +1 +2 +3 +4": 3,
+    "1, 3, 5": 2,
+    "2, 4, 6": 2,
+}
+
+possible_values = list(dice_and_rule_values.keys())
+
+LINE_LENGTH = 4  # tiles in a row that win instantly
+
+# move kinds in the move log
+PLAY, PASS, REMOVE = "play", "pass", "remove"
+
+# the 8 cells around a tile; each same-owner pair earns a 1 point adjacency bonus
+NEIGHBOURS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+# ----------------- Helper functions -------------------------
+
+
+def is_dice_face(value: str) -> bool:
+    return all(part.isdigit() for part in value.split())
+
+
+def dice_string_to_faces(s: str) -> str:
+    return " ".join(die_face[n] for n in s.split()) if is_dice_face(s) else s
+
+
+def tile_deck(values, n: int, rng=random, weights=None) -> list:
+    """Deal n tiles from values.
+
+    Without weights, boards that fit the rule set get distinct tiles as
+    before; bigger boards are dealt from as many shuffled copies of the full
+    set as needed, so every tile appears about equally often. With weights,
+    tiles are drawn independently with those relative frequencies.
+    """
+    values = list(values)
+    if weights is not None:
+        return rng.choices(values, weights=weights, k=n)
+    if n <= len(values):
+        return rng.sample(values, n)
+    deck = []
+    while len(deck) < n:
+        deck.extend(rng.sample(values, len(values)))
+    return deck[:n]
+
+
+def random_grid(values, rows=DEFAULT_ROWS, cols=DEFAULT_COLS, rng=random, weights=None):
+    shuffled = tile_deck(values, rows * cols, rng, weights)
+    return [shuffled[i * cols:(i + 1) * cols] for i in range(rows)]
+
+
+def count_total_points(grid, owner_matrix, values=dice_and_rule_values):
+    rows, cols = len(owner_matrix), len(owner_matrix[0])
+    score_p1 = score_p2 = 0
+    counted = set()
+
+    for r in range(rows):
+        for c in range(cols):
+            owner = owner_matrix[r][c]
+            if owner is None:
+                continue
+            base = values.get(grid[r][c], 0)
+            if owner == "Player 1":
+                score_p1 += base
+            else:
+                score_p2 += base
+
+            # adjacency bonus
+            for dr, dc in [(-1, 0), (0, -1), (-1, -1), (-1, 1)]:
+                nr, nc = r + dr, c + dc
+                if 0 <= nr < rows and 0 <= nc < cols and owner_matrix[nr][nc] == owner:
+                    pair = tuple(sorted(((r, c), (nr, nc))))
+                    if pair not in counted:
+                        if owner == "Player 1":
+                            score_p1 += 1
+                        else:
+                            score_p2 += 1
+                        counted.add(pair)
+
+    return score_p1, score_p2
+
+
+def count_tiles(owner_matrix):
+    """Return (tiles_p1, tiles_p2)."""
+    return (
+        sum(cell == "Player 1" for row in owner_matrix for cell in row),
+        sum(cell == "Player 2" for row in owner_matrix for cell in row),
+    )
+
+
+# -------------------- Game State ----------------------------
+
+
+class GameState:
+    """Rules and state of one game, with no UI or config dependencies."""
+
+    def __init__(
+        self,
+        rows: int = DEFAULT_ROWS,
+        cols: int = DEFAULT_COLS,
+        seed=None,
+        values: dict = dice_and_rule_values,
+        point_limit: int = POINT_LIMIT,
+        round_limit: int = ROUND_LIMIT,
+        tile_weights=None,
+    ):
+        self.rows = rows
+        self.cols = cols
+        # house rules
+        self.values = values
+        self.tile_weights = tile_weights  # relative frequency per tile in values order
+        self.point_limit = point_limit
+        self.round_limit = round_limit
+
+        self.seed = seed if seed is not None else random.randrange(2**32)
+        self.rng = random.Random(self.seed)
+        self.grid = random_grid(list(self.values), rows, cols, self.rng, self.tile_weights)
+        self.owner = [[None] * cols for _ in range(rows)]
+        self.player = "Player 1"  # whose turn it is
+        # five dice rolled by the player to move; while set, only tiles the
+        # roll satisfies can be claimed (None: dice are rolled off-app)
+        self.roll = None
+        self.rerolls_left = 0
+
+        # rounds per player (turns, including pass)
+        self.rounds = {"Player 1": 0, "Player 2": 0}
+
+        # game-end state
+        self.game_over = False
+        self.winner = None  # "Player 1", "Player 2", or None for tie
+        self.win_reason = ""
+        self.pending_last_turn_for = None  # who still gets a last turn due to 21+ rule
+
+        # running totals, kept in step with owner by _claim/_release
+        self._reset_counters()
+
+        # move log for undo/redo/replay, one small delta tuple per move:
+        # (kind, row, col, mover, end state before the move or None if unchanged)
+        self.history: list[tuple] = []
+        self.redo_stack: list[tuple] = []  # (kind, row, col) moves undone
+        self._redoing = False
+
+    # ---- core operations ----
+
+    def reset_board(self, seed=None):
+        self.seed = seed if seed is not None else self.rng.randrange(2**32)
+        self.rng = random.Random(self.seed)
+        self.grid = random_grid(
+            list(self.values), self.rows, self.cols, self.rng, self.tile_weights
+        )
+        self.owner = [[None] * self.cols for _ in range(self.rows)]
+        self.player = "Player 1"
+        self.roll = None
+        self.rerolls_left = 0
+        self.rounds = {"Player 1": 0, "Player 2": 0}
+        self.game_over = False
+        self.winner = None
+        self.win_reason = ""
+        self.pending_last_turn_for = None
+        self._reset_counters()
+        self.history.clear()
+        self.redo_stack.clear()
+
+    def copy(self) -> "GameState":
+        """Independent deep copy as a plain engine GameState.
+
+        Subclasses (e.g. the UI's) come back as GameState, so the copy can be
+        pickled to worker processes that never import the UI.
+        """
+        clone = GameState.__new__(GameState)
+        clone.__dict__ = copy.deepcopy(self.__dict__)
+        return clone
+
+    # ---- incremental score / tile counters ----
+
+    def _reset_counters(self):
+        self.base_points = {"Player 1": 0, "Player 2": 0}
+        self.adjacency_bonus = {"Player 1": 0, "Player 2": 0}
+        self.tile_counts = {"Player 1": 0, "Player 2": 0}
+
+    def _same_owner_neighbours(self, r: int, c: int, player: str) -> int:
+        n = 0
+        for dr, dc in NEIGHBOURS:
+            nr, nc = r + dr, c + dc
+            if 0 <= nr < self.rows and 0 <= nc < self.cols and self.owner[nr][nc] == player:
+                n += 1
+        return n
+
+    def _claim(self, r: int, c: int, player: str):
+        self.owner[r][c] = player
+        self.base_points[player] += self.values.get(self.grid[r][c], 0)
+        self.adjacency_bonus[player] += self._same_owner_neighbours(r, c, player)
+        self.tile_counts[player] += 1
+
+    def _release(self, r: int, c: int):
+        player = self.owner[r][c]
+        self.owner[r][c] = None
+        self.base_points[player] -= self.values.get(self.grid[r][c], 0)
+        self.adjacency_bonus[player] -= self._same_owner_neighbours(r, c, player)
+        self.tile_counts[player] -= 1
+
+    def score(self, player: str) -> int:
+        return self.base_points[player] + self.adjacency_bonus[player]
+
+    def scores(self):
+        """Return (score_p1, score_p2) without rescanning the board."""
+        return self.score("Player 1"), self.score("Player 2")
+
+    # ---- move log: undo / redo / replay ----
+
+    def _end_state(self):
+        return (self.game_over, self.winner, self.win_reason, self.pending_last_turn_for)
+
+    def _record(self, kind: str, r, c, mover: str, end_before):
+        if end_before == self._end_state():
+            end_before = None
+        self.history.append((kind, r, c, mover, end_before))
+        if not self._redoing:
+            self.redo_stack.clear()
+
+    def undo_last(self):
+        """Undo the last logged move (place, pass or removal) in O(1)."""
+        if not self.history:
+            return
+        kind, r, c, mover, end_before = self.history.pop()
+        self.roll = None
+        if kind == PLAY:
+            self._release(r, c)
+            self.rounds[mover] -= 1
+        elif kind == PASS:
+            self.rounds[mover] -= 1
+        else:  # REMOVE
+            self._claim(r, c, mover)
+        self.player = mover
+        if end_before is not None:
+            (
+                self.game_over,
+                self.winner,
+                self.win_reason,
+                self.pending_last_turn_for,
+            ) = end_before
+        self.redo_stack.append((kind, r, c))
+
+    def redo(self):
+        """Re-apply the last undone move."""
+        if not self.redo_stack:
+            return
+        self._redoing = True
+        self.roll = None
+        try:
+            self.apply(self.redo_stack.pop())
+        finally:
+            self._redoing = False
+
+    def apply(self, move):
+        """Apply a (kind, row, col) move as found in move_log()."""
+        kind, r, c = move
+        if kind == PASS:
+            self.pass_turn()
+        else:
+            self.play(r, c)
+
+    def move_log(self):
+        """Moves played so far; with the seed this is enough to replay the game."""
+        return [entry[:3] for entry in self.history]
+
+    def record(self) -> dict:
+        """Compact, JSON-friendly description of the game so far."""
+        return {
+            "seed": self.seed,
+            "rows": self.rows,
+            "cols": self.cols,
+            "point_limit": self.point_limit,
+            "round_limit": self.round_limit,
+            "grid": self.grid,
+            "moves": self.move_log(),
+        }
+
+    @classmethod
+    def replay(cls, moves, seed, **kwargs) -> "GameState":
+        """Rebuild a game from its seed and move log."""
+        game = cls(seed=seed, **kwargs)
+        for move in moves:
+            game.apply(move)
+        return game
+
+    def _has_four_in_line(self, player: str) -> bool:
+        rows, cols = self.rows, self.cols
+        directions = [(1, 0), (0, 1), (1, 1), (1, -1)]
+        for r in range(rows):
+            for c in range(cols):
+                if self.owner[r][c] != player:
+                    continue
+                for dr, dc in directions:
+                    ok = True
+                    for k in range(1, 4):
+                        nr, nc = r + dr * k, c + dc * k
+                        if not (0 <= nr < rows and 0 <= nc < cols):
+                            ok = False
+                            break
+                        if self.owner[nr][nc] != player:
+                            ok = False
+                            break
+                    if ok:
+                        return True
+        return False
+
+    def _line_through(self, r: int, c: int, player: str) -> bool:
+        """Is (r, c) part of a full line of player's tiles?"""
+        owner = self.owner
+        rows, cols = self.rows, self.cols
+        for dr, dc in ((1, 0), (0, 1), (1, 1), (1, -1)):
+            run = 1
+            for sign in (1, -1):
+                nr, nc = r + sign * dr, c + sign * dc
+                while 0 <= nr < rows and 0 <= nc < cols and owner[nr][nc] == player:
+                    run += 1
+                    nr, nc = nr + sign * dr, nc + sign * dc
+            if run >= LINE_LENGTH:
+                return True
+        return False
+
+    def _check_four_winner(self):
+        p1 = self._has_four_in_line("Player 1")
+        p2 = self._has_four_in_line("Player 2")
+        if p1 and not p2:
+            return "Player 1"
+        if p2 and not p1:
+            return "Player 2"
+        if p1 and p2:
+            return None
+        return None
+
+    def _decide_winner_by_score(self, reason: str):
+        p1, p2 = self.scores()
+        self.game_over = True
+        self.win_reason = reason
+        if p1 > p2:
+            self.winner = "Player 1"
+        elif p2 > p1:
+            self.winner = "Player 2"
+        else:
+            self.winner = None  # tie
+
+    def _after_turn(self, last_player: str, cell=None):
+        """Evaluate win conditions after last_player finished their turn.
+
+        cell is the tile just placed, or None for a pass. Any earlier line
+        would already have ended the game, so only lines through the new tile
+        need checking, and a pass cannot create one.
+        """
+        if self.game_over:
+            return
+
+        # 1) check 4-in-a-row instant win
+        if cell is not None and self._line_through(*cell, last_player):
+            self.game_over = True
+            self.winner = last_player
+            self.win_reason = "4 tiles in a line"
+            return
+
+        p1_score, p2_score = self.scores()
+
+        # 2) handle pending last turn due to 21+ rule
+        if self.pending_last_turn_for:
+            if last_player == self.pending_last_turn_for:
+                self.pending_last_turn_for = None
+                self._decide_winner_by_score(f"{self.point_limit}+ reached, last turn played")
+                return
+        else:
+            # if someone just crossed 21+ this turn, trigger last turn for the opponent
+            if p1_score >= self.point_limit or p2_score >= self.point_limit:
+                self.pending_last_turn_for = (
+                    "Player 2" if last_player == "Player 1" else "Player 1"
+                )
+
+        # 3) rounds limit: once both played 6 rounds, higher score wins
+        if (
+            self.rounds["Player 1"] >= self.round_limit
+            and self.rounds["Player 2"] >= self.round_limit
+        ):
+            self._decide_winner_by_score(f"Both played {self.round_limit} rounds")
+            return
+
+        if self.game_over:
+            return
+
+        # 4) choose next player
+        if self.pending_last_turn_for:
+            self.player = self.pending_last_turn_for
+        else:
+            self.player = "Player 2" if last_player == "Player 1" else "Player 1"
+
+    def _can_player_act(self, player: str) -> bool:
+        if self.game_over:
+            return False
+        if self.pending_last_turn_for and player != self.pending_last_turn_for:
+            return False
+        if self.rounds[player] >= self.round_limit:
+            return False
+        return True
+
+    def play(self, r, c) -> str:
+        current = self.player
+
+        if not self._can_player_act(current):
+            return "blocked"
+
+        owner = self.owner[r][c]
+
+        if owner == current:
+            self._release(r, c)
+            self._record(REMOVE, r, c, current, None)
+            return "removed"
+
+        if owner is not None and owner != current:
+            return "blocked"
+
+        if owner is None:
+            if self.roll is not None and not dice.table_for(self.values).allows(
+                self.roll, self.grid[r][c]
+            ):
+                return "blocked"
+            end_before = self._end_state()
+            self.roll = None
+            self._claim(r, c, current)
+            self.rounds[current] += 1
+            self._after_turn(current, (r, c))
+            self._record(PLAY, r, c, current, end_before)
+            return "placed"
+
+        return "blocked"
+
+    def roll_dice(self, keep=(), rng=random) -> tuple:
+        """Roll five dice for the player to move, or reroll all but `keep`.
+
+        The first roll of a turn is followed by up to dice.REROLLS rerolls.
+        Until the turn ends, play() only claims tiles the roll satisfies.
+        """
+        if not self._can_player_act(self.player):
+            return self.roll
+        if self.roll is None:
+            self.roll = dice.roll(rng)
+            self.rerolls_left = dice.REROLLS
+        elif self.rerolls_left > 0:
+            self.roll = dice.reroll(self.roll, keep, rng)
+            self.rerolls_left -= 1
+        return self.roll
+
+    def claimable(self):
+        """Free cells the current roll allows (all of them without a roll)."""
+        free = self.free_cells()
+        if self.roll is None:
+            return free
+        table = dice.table_for(self.values)
+        return [(r, c) for r, c in free if table.allows(self.roll, self.grid[r][c])]
+
+    def free_cells(self):
+        """Cells nobody owns yet, in row-major order."""
+        return [
+            (r, c)
+            for r in range(self.rows)
+            for c in range(self.cols)
+            if self.owner[r][c] is None
+        ]
+
+    def pass_turn(self):
+        current = self.player
+        if not self._can_player_act(current):
+            return
+        end_before = self._end_state()
+        self.roll = None
+        self.rounds[current] += 1
+        self._after_turn(current)
+        self._record(PASS, None, None, current, end_before)
@@ -0,0 +1,208 @@
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# ----------------- Game log store ---------------------------
+#
+# Finished games go to a local SQLite database for analytics. record() only
+# puts the game on a queue; a background thread writes batches in single
+# transactions, with the database in WAL mode so queries can run while it
+# writes.
+
+DEFAULT_PATH = "games.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    finished_at REAL NOT NULL,
+    seed INTEGER,
+    rows INTEGER NOT NULL,
+    cols INTEGER NOT NULL,
+    point_limit INTEGER NOT NULL,
+    round_limit INTEGER NOT NULL,
+    first_player TEXT NOT NULL,
+    winner TEXT,
+    win_reason TEXT NOT NULL,
+    score_p1 INTEGER NOT NULL,
+    score_p2 INTEGER NOT NULL,
+    grid TEXT NOT NULL,
+    moves TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS game_tiles (
+    game_id INTEGER NOT NULL REFERENCES games(id),
+    tile TEXT NOT NULL,
+    owner TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_first_player ON games(first_player, winner);
+CREATE INDEX IF NOT EXISTS games_win_reason ON games(win_reason);
+CREATE INDEX IF NOT EXISTS game_tiles_tile ON game_tiles(tile, owner);
+CREATE INDEX IF NOT EXISTS game_tiles_game ON game_tiles(game_id);
+"""
+
+
+def game_row(game) -> dict:
+    """Everything we store about one finished GameState."""
+    record = game.record()
+    p1, p2 = game.scores()
+    tiles = [
+        (game.grid[r][c], owner)
+        for r, row in enumerate(game.owner)
+        for c, owner in enumerate(row)
+        if owner is not None
+    ]
+    return {
+        "finished_at": time.time(),
+        "seed": record["seed"],
+        "rows": record["rows"],
+        "cols": record["cols"],
+        "point_limit": record["point_limit"],
+        "round_limit": record["round_limit"],
+        "first_player": "Player 1",
+        "winner": game.winner,
+        "win_reason": game.win_reason,
+        "score_p1": p1,
+        "score_p2": p2,
+        "grid": json.dumps(record["grid"], ensure_ascii=False),
+        "moves": json.dumps(record["moves"]),
+        "tiles": tiles,
+    }
+
+
+def connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class GameLog:
+    def __init__(
+        self,
+        path: str = DEFAULT_PATH,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.last_error: Exception | None = None
+
+        self._queue: queue.Queue = queue.Queue()
+        self._writer = connect(path)
+        self._lock = threading.Lock()  # guards the read connection
+        self._reader = connect(path)
+        self._thread = threading.Thread(target=self._run, name="game-log", daemon=True)
+        self._thread.start()
+
+    # ---- writing ----
+
+    def record(self, game) -> None:
+        """Queue a finished game; never waits on disk."""
+        if game.game_over:
+            self._queue.put(game_row(game))
+
+    def record_row(self, row: dict) -> None:
+        self._queue.put(row)
+
+    def flush(self) -> None:
+        """Block until everything queued so far is on disk."""
+        self._queue.join()
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+        self._writer.close()
+        with self._lock:
+            self._reader.close()
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            if None in batch:
+                stop = True
+            rows = [row for row in batch if row is not None]
+            try:
+                if rows:
+                    self._write(rows)
+            except Exception as e:
+                self.last_error = e
+                log.warning("could not write %d games to %s: %s", len(rows), self.path, e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, rows):
+        with self._writer:  # one transaction per batch
+            for row in rows:
+                cur = self._writer.execute(
+                    "INSERT INTO games (finished_at, seed, rows, cols, point_limit, round_limit,"
+                    " first_player, winner, win_reason, score_p1, score_p2, grid, moves)"
+                    " VALUES (:finished_at, :seed, :rows, :cols, :point_limit, :round_limit,"
+                    " :first_player, :winner, :win_reason, :score_p1, :score_p2, :grid, :moves)",
+                    row,
+                )
+                self._writer.executemany(
+                    "INSERT INTO game_tiles (game_id, tile, owner) VALUES (?, ?, ?)",
+                    [(cur.lastrowid, tile, owner) for tile, owner in row["tiles"]],
+                )
+        self.written += len(rows)
+
+    # ---- queries ----
+
+    def _query(self, sql: str, args=()):
+        with self._lock:
+            return self._reader.execute(sql, args).fetchall()
+
+    def count(self) -> int:
+        return self._query("SELECT COUNT(*) FROM games")[0][0]
+
+    def win_rate_by_first_player(self) -> dict:
+        """{first_player: {"games", "wins", "ties", "win_rate"}}."""
+        result = {}
+        for first, games, wins, ties in self._query(
+            "SELECT first_player, COUNT(*), COALESCE(SUM(winner = first_player), 0),"
+            " SUM(winner IS NULL)"
+            " FROM games GROUP BY first_player"
+        ):
+            result[first] = {
+                "games": games,
+                "wins": wins,
+                "ties": ties,
+                "win_rate": wins / games,
+            }
+        return result
+
+    def win_reasons(self) -> dict:
+        return dict(
+            self._query(
+                "SELECT win_reason, COUNT(*) FROM games GROUP BY win_reason ORDER BY 2 DESC"
+            )
+        )
+
+    def win_rate_by_tile(self) -> dict:
+        """{tile: {"claimed", "win_rate"}}: how often owning a tile went with winning."""
+        result = {}
+        for tile, claimed, wins in self._query(
+            "SELECT t.tile, COUNT(*), COALESCE(SUM(g.winner = t.owner), 0) AS wins"
+            " FROM game_tiles t JOIN games g ON g.id = t.game_id"
+            " GROUP BY t.tile ORDER BY 1.0 * wins / COUNT(*) DESC"
+        ):
+            result[tile] = {"claimed": claimed, "win_rate": wins / claimed}
+        return result
@@ -0,0 +1,88 @@
+from engine import LINE_LENGTH, GameState
+
+# ----------------- Move hints -------------------------------
+#
+# Scores every free cell for the player to move in one pass over the board,
+# without playing and undoing each candidate. Per free cell this looks at its
+# 8 neighbours once: same-owner neighbours give the adjacency bonus (as in
+# count_total_points), and runs of tiles through the cell give the line a
+# claim there would make or take from the opponent (as in _has_four_in_line).
+# Runs are only followed up to LINE_LENGTH - 1 tiles each way, so the cost
+# per cell is bounded and the whole pass is linear in the board size.
+
+DIRECTIONS = ((1, 0), (0, 1), (1, 1), (1, -1))
+OFF_BOARD = "#"  # owner value of the border cells
+
+
+class CellHint:
+    """What claiming one free cell is worth to the player to move."""
+
+    __slots__ = ("gain", "line", "block")
+
+    def __init__(self, gain: int, line: int, block: int):
+        self.gain = gain  # points gained, tile value plus adjacency bonus
+        self.line = line  # longest own line through the cell once claimed
+        self.block = block  # longest opponent line the claim would cut
+
+    @property
+    def wins(self) -> bool:
+        return self.line >= LINE_LENGTH
+
+    @property
+    def blocks_win(self) -> bool:
+        """The opponent would complete a line here."""
+        return self.block >= LINE_LENGTH
+
+    def __repr__(self):
+        return f"CellHint(gain={self.gain}, line={self.line}, block={self.block})"
+
+
+def cell_hints(game: GameState, player: str | None = None) -> dict:
+    """{(row, col): CellHint} for every free cell."""
+    player = player or game.player
+    values = game.values
+    rows, cols = game.rows, game.cols
+    cap = LINE_LENGTH - 1
+
+    # owners as one flat list with a border of `cap` off-board cells, so runs
+    # can be followed without bounds checks
+    width = cols + 2 * cap
+    edge = [OFF_BOARD] * cap
+    flat = [OFF_BOARD] * (cap * width)
+    for row in game.owner:
+        flat += edge + row + edge
+    flat += [OFF_BOARD] * (cap * width)
+    steps = [dr * width + dc for dr, dc in DIRECTIONS]
+
+    hints = {}
+    for r in range(rows):
+        grid_row = game.grid[r]
+        base = (r + cap) * width + cap
+        for c in range(cols):
+            i = base + c
+            if flat[i] is not None:
+                continue
+            gain = values.get(grid_row[c], 0)
+            line = block = 1
+            for step in steps:
+                mine = theirs = 1
+                for off in (step, -step):
+                    j = i + off
+                    who = flat[j]
+                    if who is None or who is OFF_BOARD:
+                        continue
+                    run = 0
+                    while run < cap and flat[j] == who:
+                        run += 1
+                        j += off
+                    if who == player:
+                        gain += 1  # adjacency bonus with that neighbour
+                        mine += run
+                    else:
+                        theirs += run
+                if mine > line:
+                    line = mine
+                if theirs > block:
+                    block = theirs
+            hints[(r, c)] = CellHint(gain, min(line, LINE_LENGTH), min(block, LINE_LENGTH))
+    return hints
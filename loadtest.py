@@ -0,0 +1,380 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import uuid
+
+import aiohttp
+import socketio
+
+# ----------------- Load test --------------------------------
+#
+# Starts app.py locally and drives it with N simulated browsers. Each one
+# loads the page, connects the NiceGUI websocket the way the browser client
+# does, and replays a script of clicks, passes and undos on its own table.
+# A new game is started whenever one ends. Latency is the time from
+# sending an event to the first "update" the server sends back. Everything
+# runs offline against 127.0.0.1.
+
+DEFAULT_SCRIPT = "click,click,click,pass,click,undo,click,click"
+RESPONSE_TIMEOUT = 5.0  # seconds to wait for the update that answers an event
+ELEMENTS = re.compile(r"parseElements\(String\.raw`(.*?)`\)", re.S)
+CLIENT_ID = re.compile(r"'client_id': '([0-9a-f-]+)'")
+
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def summarize(values) -> dict:
+    """Percentiles of a list of seconds, in milliseconds."""
+    return {
+        "count": len(values),
+        "p50_ms": percentile(values, 0.50) * 1e3,
+        "p90_ms": percentile(values, 0.90) * 1e3,
+        "p99_ms": percentile(values, 0.99) * 1e3,
+        "max_ms": max(values, default=0.0) * 1e3,
+    }
+
+
+# ----------------- Server -----------------------------------
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def tree_rss(pid: int) -> int:
+    """Resident bytes of pid and all its descendants (Linux /proc only)."""
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "rb") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # the command name may contain spaces; fields resume after ")"
+        parents[int(entry)] = int(stat[stat.rindex(b")") + 2:].split()[1])
+    family, frontier = {pid}, [pid]
+    while frontier:
+        parent = frontier.pop()
+        for child, ppid in parents.items():
+            if ppid == parent and child not in family:
+                family.add(child)
+                frontier.append(child)
+    total = 0
+    for member in family:
+        with contextlib.suppress(OSError), open(f"/proc/{member}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    total += int(line.split()[1]) * 1024
+    return total
+
+
+@contextlib.contextmanager
+def local_server(workdir: str):
+    """Run app.py on a free port with its state files in workdir."""
+    port = free_port()
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        GAME_LOG=os.path.join(workdir, "games.sqlite3"),
+        CHECKPOINT_PATH=os.path.join(workdir, "sessions.ckpt"),
+    )
+    app = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+    with open(os.path.join(workdir, "server.log"), "wb") as log:
+        process = subprocess.Popen(
+            [sys.executable, app], cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+    try:
+        yield process, f"http://127.0.0.1:{port}"
+    finally:
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def wait_until_up(url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as http:
+        while True:
+            with contextlib.suppress(aiohttp.ClientError):
+                async with http.get(url + "/metrics") as response:
+                    if response.status < 500:  # /metrics may be local-only
+                        return
+            if time.monotonic() > deadline:
+                sys.exit(f"server at {url} did not come up within {timeout:.0f}s")
+            await asyncio.sleep(0.2)
+
+
+# ----------------- Simulated browser ------------------------
+
+
+class Browser:
+    """One page of app.py, connected over the NiceGUI websocket."""
+
+    def __init__(self, url: str, room: str, rng: random.Random):
+        self.url = url
+        self.room = room
+        self.rng = rng
+        self.elements = {}  # id -> element dict, kept current from updates
+        self.client_id = None
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self.sio.on("update", self._on_update)
+        self._answered = asyncio.Event()
+        self._next_message_id = 0
+        self.game_over = False
+        self.latencies = {}  # op -> [seconds]
+        self.timeouts = 0
+
+    async def connect(self, http: aiohttp.ClientSession):
+        async with http.get(f"{self.url}/?room={urllib.parse.quote(self.room)}") as response:
+            page = await response.text()
+        self.elements = json.loads(ELEMENTS.search(page).group(1))
+        self.client_id = CLIENT_ID.search(page).group(1)
+        query = urllib.parse.urlencode(
+            {
+                "client_id": self.client_id,
+                "next_message_id": 0,
+                "implicit_handshake": "true",
+                "document_id": str(uuid.uuid4()),
+                "tab_id": str(uuid.uuid4()),
+            }
+        )
+        await self.sio.connect(
+            f"{self.url}?{query}",
+            socketio_path="/_nicegui_ws/socket.io",
+            transports=["websocket"],
+        )
+
+    async def close(self):
+        await self.sio.disconnect()
+
+    async def _on_update(self, message):
+        self._next_message_id = message.pop("_id", self._next_message_id) + 1
+        for key, element in message.items():
+            if element is None:
+                self.elements.pop(key, None)
+                continue
+            self.elements[key] = element
+            # the only dialog this script can open is the game-over one
+            if element.get("tag") == "nicegui-dialog" and element["props"].get("model-value"):
+                self.game_over = True
+        self._answered.set()
+        await self.sio.emit(
+            "ack", {"client_id": self.client_id, "next_message_id": self._next_message_id}
+        )
+
+    def tiles(self):
+        """Board tiles in row-major order (they are created in that order)."""
+        found = [
+            (int(key), element)
+            for key, element in self.elements.items()
+            if element.get("style", {}).get("cursor") == "pointer" and element.get("events")
+        ]
+        return [key for key, _ in sorted(found)]
+
+    def button(self, label: str) -> str:
+        for key, element in self.elements.items():
+            if element.get("tag") == "q-btn" and element.get("props", {}).get("label") == label:
+                return key
+        raise LookupError(f"no {label!r} button on the page")
+
+    async def send(self, op: str, element_id) -> bool:
+        """Fire the element's click listener and time the answering update."""
+        element = self.elements[str(element_id)]
+        listener = next(e for e in element["events"] if e["type"] == "click")
+        self._answered.clear()
+        started = time.perf_counter()
+        await self.sio.emit(
+            "event",
+            {
+                "id": int(element_id),
+                "client_id": self.client_id,
+                "listener_id": listener["listener_id"],
+                "args": [],
+            },
+        )
+        try:
+            await asyncio.wait_for(self._answered.wait(), RESPONSE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return False
+        self.latencies.setdefault(op, []).append(time.perf_counter() - started)
+        return True
+
+    async def play(self, script, actions: int, think: float):
+        """Replay the script on this browser's own table, hot-seat style."""
+        free = list(range(len(self.tiles())))
+        self.rng.shuffle(free)
+        played = []  # cell index or None for a pass, for undo
+        for step in range(actions):
+            if self.game_over:
+                self.game_over = False
+                await self.send("new_game", self.button("New game"))
+                free = list(range(len(self.tiles())))
+                self.rng.shuffle(free)
+                played.clear()
+            op = script[step % len(script)]
+            if op == "undo" and not played:
+                op = "pass"
+            if op == "click" and not free:
+                op = "pass"
+            if op == "click":
+                cell = free.pop()
+                played.append(cell)
+                await self.send(op, self.tiles()[cell])
+            elif op == "pass":
+                played.append(None)
+                await self.send(op, self.button("Pass"))
+            elif op == "undo":
+                cell = played.pop()
+                if cell is not None:
+                    free.append(cell)
+                await self.send(op, self.button("Undo"))
+            else:
+                raise ValueError(f"unknown script step {op!r}")
+            if think:
+                await asyncio.sleep(self.rng.uniform(0.5, 1.5) * think)
+
+
+# ----------------- Runner -----------------------------------
+
+
+async def run_clients(url: str, clients: int, actions: int, script, think: float, seed: int,
+                      server_pid: int | None) -> dict:
+    rng = random.Random(seed)
+    browsers = [Browser(url, f"load-{seed}-{i}", random.Random(rng.random())) for i in range(clients)]
+    memory = {"idle_bytes": tree_rss(server_pid) if server_pid else None, "peak_bytes": 0}
+
+    async def sample_memory():
+        while True:
+            memory["peak_bytes"] = max(memory["peak_bytes"], tree_rss(server_pid))
+            await asyncio.sleep(0.5)
+
+    sampler = asyncio.create_task(sample_memory()) if server_pid else None
+    connect_times = []
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as http:
+
+        async def connect(browser):
+            started = time.perf_counter()
+            await browser.connect(http)
+            connect_times.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(connect(b) for b in browsers))
+        if server_pid:
+            memory["connected_bytes"] = tree_rss(server_pid)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(b.play(script, actions, think) for b in browsers))
+        elapsed = time.perf_counter() - started
+        await asyncio.gather(*(b.close() for b in browsers))
+
+    if sampler:
+        sampler.cancel()
+        memory["peak_bytes"] = max(memory["peak_bytes"], tree_rss(server_pid))
+        memory["per_client_bytes"] = (memory["connected_bytes"] - memory["idle_bytes"]) / clients
+
+    by_op = {}
+    for browser in browsers:
+        for op, values in browser.latencies.items():
+            by_op.setdefault(op, []).extend(values)
+    answered = [v for values in by_op.values() for v in values]
+    return {
+        "clients": clients,
+        "actions_per_client": actions,
+        "think_s": think,
+        "seconds": elapsed,
+        "events_per_second": len(answered) / elapsed if elapsed else 0.0,
+        "timeouts": sum(b.timeouts for b in browsers),
+        "connect": summarize(connect_times),
+        "latency": summarize(answered),
+        "latency_by_op": {op: summarize(values) for op, values in sorted(by_op.items())},
+        "server_memory": memory if server_pid else None,
+    }
+
+
+def print_report(result: dict):
+    out = sys.stderr
+    print(
+        f"{result['clients']} clients x {result['actions_per_client']} actions "
+        f"in {result['seconds']:.1f}s: {result['events_per_second']:.1f} events/s, "
+        f"{result['timeouts']} timeouts",
+        file=out,
+    )
+    rows = [("connect", result["connect"]), ("all events", result["latency"])]
+    rows += list(result["latency_by_op"].items())
+    print(f"  {'':<12} {'n':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}", file=out)
+    for name, s in rows:
+        print(
+            f"  {name:<12} {s['count']:>6} {s['p50_ms']:>9.1f} {s['p90_ms']:>9.1f} "
+            f"{s['p99_ms']:>9.1f} {s['max_ms']:>9.1f}",
+            file=out,
+        )
+    memory = result["server_memory"]
+    if memory:
+        mb = 1 / (1 << 20)
+        print(
+            f"  server RSS: idle {memory['idle_bytes'] * mb:.1f} MB, "
+            f"connected {memory['connected_bytes'] * mb:.1f} MB, "
+            f"peak {memory['peak_bytes'] * mb:.1f} MB, "
+            f"{memory['per_client_bytes'] / 1024:.0f} KB per client",
+            file=out,
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test app.py with simulated browsers")
+    parser.add_argument("--clients", type=int, nargs="+", default=[10], help="one run per count")
+    parser.add_argument("--actions", type=int, default=30, help="scripted events per client")
+    parser.add_argument("--script", default=DEFAULT_SCRIPT, help="comma-separated click/pass/undo")
+    parser.add_argument("--think", type=float, default=0.2, help="mean pause between events (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--url", help="test a running server instead of starting one")
+    parser.add_argument("--output", help="JSON lines file to append results to")
+    args = parser.parse_args(argv)
+    script = args.script.split(",")
+
+    results = []
+    with contextlib.ExitStack() as stack:
+        url, pid = args.url, None
+        if url is None:
+            workdir = stack.enter_context(tempfile.TemporaryDirectory())
+            process, url = stack.enter_context(local_server(workdir))
+            pid = process.pid if sys.platform.startswith("linux") else None
+        asyncio.run(wait_until_up(url))
+        for i, clients in enumerate(args.clients):
+            result = asyncio.run(
+                run_clients(url, clients, args.actions, script, args.think, args.seed + i, pid)
+            )
+            print_report(result)
+            results.append(result)
+
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+        print(f"results appended to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
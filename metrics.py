@@ -0,0 +1,233 @@
+import bisect
+import contextlib
+import json
+import sys
+import threading
+import time
+from collections import Counter
+
+# ----------------- Metrics ----------------------------------
+#
+# Small in-process instruments rendered in the Prometheus text format.
+# Everything is updated from the event loop, so no locking is needed except
+# in the sampling profiler, which runs on its own thread.
+
+PREFIX = "pinakostkada"
+
+# seconds; handlers should stay well under a frame (16 ms)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+# bytes of one websocket "update" message
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    body = ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+    return "{" + body + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram, one series per label value."""
+
+    def __init__(self, name: str, help: str, buckets, label: str):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.label = label
+        self._series: dict[str, list] = {}  # value -> [bucket counts..., +Inf, sum]
+
+    def observe(self, label_value: str, value: float):
+        series = self._series.get(label_value)
+        if series is None:
+            series = self._series[label_value] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for label_value, series in sorted(self._series.items()):
+            running = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                running += count
+                le = _labels({self.label: label_value, "le": bound})
+                yield f"{self.name}_bucket{le} {running}"
+            labels = _labels({self.label: label_value})
+            yield f"{self.name}_sum{labels} {series[-1]}"
+            yield f"{self.name}_count{labels} {running}"
+
+
+class Rate:
+    """Event counter plus a per-second rate over the last `window` seconds."""
+
+    def __init__(self, name: str, help: str, window: int = 60):
+        self.name = name
+        self.help = help
+        self.window = window
+        self.total = 0
+        self._slots = [0] * window  # events per second, ring buffer
+        self._slot_second = [0] * window
+
+    def inc(self, n: int = 1):
+        self.total += n
+        second = int(time.monotonic())
+        i = second % self.window
+        if self._slot_second[i] != second:
+            self._slot_second[i] = second
+            self._slots[i] = 0
+        self._slots[i] += n
+
+    def per_second(self) -> float:
+        now = int(time.monotonic())
+        recent = sum(
+            count
+            for count, second in zip(self._slots, self._slot_second)
+            if now - self.window < second <= now
+        )
+        return recent / self.window
+
+    def render(self):
+        yield f"# HELP {self.name}_total {self.help}"
+        yield f"# TYPE {self.name}_total counter"
+        yield f"{self.name}_total {self.total}"
+        yield f"# HELP {self.name}_per_second {self.help}, per second over the last {self.window}s"
+        yield f"# TYPE {self.name}_per_second gauge"
+        yield f"{self.name}_per_second {self.per_second()}"
+
+
+class Gauge:
+    """Value read from a callback at scrape time."""
+
+    def __init__(self, name: str, help: str, read):
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        yield f"{self.name} {self.read()}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.latency = self.add(
+            Histogram(
+                f"{PREFIX}_handler_seconds",
+                "Time spent in UI handlers and refreshes",
+                LATENCY_BUCKETS,
+                "handler",
+            )
+        )
+        self.moves = self.add(Rate(f"{PREFIX}_moves", "Moves played"))
+        self.update_bytes = self.add(
+            Histogram(
+                f"{PREFIX}_ws_update_bytes",
+                "Size of sampled websocket update messages",
+                SIZE_BUCKETS,
+                "message",
+            )
+        )
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help: str, read):
+        return self.add(Gauge(f"{PREFIX}_{name}", help, read))
+
+    @contextlib.contextmanager
+    def timed(self, name: str):
+        """Record the duration of the block (or decorated sync function)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.latency.observe(name, time.perf_counter() - started)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def instrument_socketio(sio, registry: Registry, sample_every: int = 10):
+    """Record the size of every `sample_every`-th websocket update.
+
+    Sizes are measured by serializing the payload again, so only a sample is
+    taken.
+    """
+    # replace, not stack, an earlier wrapper
+    emit = getattr(sio.emit, "original", sio.emit)
+    seen = Counter()
+
+    async def measured_emit(event, data=None, *args, **kwargs):
+        seen[event] += 1
+        if event == "update" and seen[event] % sample_every == 0:
+            size = len(json.dumps(data, separators=(",", ":"), default=str))
+            registry.update_bytes.observe(event, size)
+        return await emit(event, data, *args, **kwargs)
+
+    measured_emit.original = emit
+    sio.emit = measured_emit
+
+
+# ----------------- Sampling profiler ------------------------
+
+
+class SamplingProfiler:
+    """Samples one thread's stack every `interval` seconds.
+
+    Output is in the collapsed-stack format ("a;b;c count") that flame graph
+    tools read. Overhead is one stack walk per sample, off the sampled thread.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self._lock = threading.Lock()  # samples is read while the sampler writes
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._target = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, thread_id: int | None = None):
+        """Start sampling thread_id (default: the calling thread)."""
+        if self.running:
+            return
+        self._target = thread_id or threading.get_ident()
+        with self._lock:
+            self.samples.clear()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self.running:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                with self._lock:
+                    self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self, limit: int = 200) -> str:
+        with self._lock:
+            top = self.samples.most_common(limit)
+        return "".join(f"{stack} {n}\n" for stack, n in top)
@@ -0,0 +1,145 @@
+import json
+import logging
+import os
+import stat
+import tempfile
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# ----------------- Atomic writes ----------------------------
+
+
+def _read_umask() -> int:
+    # os.umask can only be read by setting it; do that once, at import, so
+    # writer threads never open files while the umask is briefly 0
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# mode open() gives a new file; mkstemp's temp files are always 0600
+NEW_FILE_MODE = 0o666 & ~_read_umask()
+
+
+def write_bytes_atomic(path: str, data: bytes) -> None:
+    """Write data to path via a temp file + rename.
+
+    A crash mid-write leaves the old file in place instead of a truncated one.
+    The file keeps its mode; a new one gets the usual umask-based mode rather
+    than the 0600 of the temp file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = NEW_FILE_MODE
+    fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def write_json_atomic(path: str, data) -> None:
+    """Write data as JSON to path, atomically."""
+    text = json.dumps(data, ensure_ascii=False, indent=2)
+    write_bytes_atomic(path, text.encode("utf-8"))
+
+
+# ----------------- Write-behind writer ----------------------
+
+
+class WriteBehind:
+    """Debounced, coalescing background writer for one JSON file.
+
+    `schedule()` only records the latest value and returns immediately. A
+    daemon thread writes once no new value has arrived for `delay` seconds,
+    so dragging a slider ends in a single write of the final value. Errors
+    are logged and kept in `last_error`.
+    """
+
+    def __init__(self, path: str, delay: float = 0.5, writer=write_json_atomic):
+        self.path = path
+        self.delay = delay
+        self.writer = writer
+        self.last_error: Exception | None = None
+        self.writes = 0
+
+        self._pending = None
+        self._seq = 0  # bumped on every schedule()
+        self._written_seq = 0
+        self._dirty = False
+        self._changed_at = 0.0
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def schedule(self, data) -> None:
+        # snapshot now, so later in-place edits of data don't leak into the write
+        snapshot = json.loads(json.dumps(data))
+        with self._cond:
+            self._pending = snapshot
+            self._seq += 1
+            self._dirty = True
+            self._changed_at = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="write-behind", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify()
+
+    def flush(self) -> None:
+        """Write any pending value now (e.g. on shutdown)."""
+        with self._cond:
+            if not self._dirty:
+                return
+            data, seq = self._pending, self._seq
+            self._dirty = False
+        self._write(data, seq)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._dirty:
+                    self._cond.wait()
+                # debounce: wait until the value has been stable for `delay`
+                while True:
+                    remaining = self._changed_at + self.delay - time.monotonic()
+                    if remaining <= 0 or not self._dirty:
+                        break
+                    self._cond.wait(remaining)
+                if not self._dirty:
+                    continue
+                data, seq = self._pending, self._seq
+                self._dirty = False
+            self._write(data, seq)
+
+    def _write(self, data, seq: int):
+        with self._write_lock:
+            # a newer value may already be on disk via flush()
+            if seq <= self._written_seq:
+                return
+            self._written_seq = seq
+            self._write_now(data)
+
+    def _write_now(self, data):
+        try:
+            self.writer(self.path, data)
+        except Exception as e:
+            self.last_error = e
+            log.warning("could not save %s: %s", self.path, e)
+        else:
+            self.last_error = None
+            self.writes += 1
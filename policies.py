@@ -0,0 +1,74 @@
+import random
+
+from engine import LINE_LENGTH, GameState
+from hints import cell_hints
+
+# ----------------- Move policies ----------------------------
+#
+# A policy picks the current player's move: a (row, col) to claim, or None
+# to pass. Policies must be plain module-level functions so they can be
+# sent to worker processes by name.
+
+
+def random_policy(game: GameState, rng: random.Random):
+    free = game.free_cells()
+    return rng.choice(free) if free else None
+
+
+def marginal_gain(game: GameState, r: int, c: int, player: str) -> int:
+    """Points player would gain by claiming the free cell (r, c)."""
+    return game.values.get(game.grid[r][c], 0) + game._same_owner_neighbours(r, c, player)
+
+
+def greedy_policy(game: GameState, rng: random.Random):
+    """Claim the cell worth the most points right now, ties broken randomly."""
+    best, best_gain = [], -1
+    for r, c in game.free_cells():
+        gain = marginal_gain(game, r, c, game.player)
+        if gain > best_gain:
+            best, best_gain = [(r, c)], gain
+        elif gain == best_gain:
+            best.append((r, c))
+    return rng.choice(best) if best else None
+
+
+def blocking_policy(game: GameState, rng: random.Random):
+    """Complete a line, else cut the opponent's longest run, else play greedy."""
+
+    def rank(hint):
+        # runs of LINE_LENGTH - 1 or more (counting the cell) are worth cutting
+        block = hint.block if hint.block >= LINE_LENGTH - 1 else 0
+        return (hint.wins, hint.blocks_win, block, hint.gain)
+
+    hints = cell_hints(game)
+    if not hints:
+        return None
+    top = max(rank(h) for h in hints.values())
+    return rng.choice([cell for cell, h in hints.items() if rank(h) == top])
+
+
+SEARCH_DEPTH = 3  # plies; a fixed depth keeps results independent of machine speed
+
+
+def search_policy(game: GameState, rng: random.Random):
+    """The search bot at a fixed depth, with a fresh table per move."""
+    import bot  # bot imports this module for marginal_gain
+
+    return bot.Searcher(float("inf"), max_depth=SEARCH_DEPTH).search(game).move
+
+
+POLICIES = {
+    "random": random_policy,
+    "greedy": greedy_policy,
+    "blocking": blocking_policy,
+    "search": search_policy,
+}
+
+
+def get_policy(name: str):
+    try:
+        return POLICIES[name]
+    except KeyError:
+        raise ValueError(
+            f"unknown policy {name!r}, choose from {', '.join(POLICIES)}"
+        ) from None
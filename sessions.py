@@ -0,0 +1,162 @@
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, TypeVar
+
+T = TypeVar("T")
+
+# ----------------- Session store ----------------------------
+
+DEFAULT_MAX_SESSIONS = 5000
+DEFAULT_IDLE_TIMEOUT = 60 * 60  # seconds
+
+
+class Session(Generic[T]):
+    """One game table plus the callbacks of everyone looking at it.
+
+    Players are `listeners` and refresh their own view. Spectators only
+    receive a ready-made frame: it is rendered once per change and the same
+    object goes to every spectator.
+    """
+
+    __slots__ = ("key", "game", "last_seen", "listeners", "spectators", "_frame")
+
+    def __init__(self, key: str, game: T):
+        self.key = key
+        self.game = game
+        self.last_seen = time.monotonic()
+        self.listeners: list[Callable[[], None]] = []
+        self.spectators: list[Callable[[str], None]] = []
+        self._frame: str | None = None
+
+    def touch(self):
+        self.last_seen = time.monotonic()
+
+    def notify(self, skip: Callable[[], None] | None = None):
+        """Tell every other viewer of this table that the state changed."""
+        for listener in list(self.listeners):
+            if listener is skip:
+                continue
+            try:
+                listener()
+            except Exception:
+                # a dead client must not break the table for everybody else
+                self.listeners.remove(listener)
+
+    def frame(self, render: Callable[[T], str]) -> str:
+        """The current spectator frame, rendered at most once per change."""
+        if self._frame is None:
+            self._frame = render(self.game)
+        return self._frame
+
+    def broadcast(self, render: Callable[[T], str]):
+        """Render the new state once and hand it to every spectator."""
+        self._frame = None
+        if not self.spectators:
+            return
+        frame = self.frame(render)
+        for spectator in list(self.spectators):
+            try:
+                spectator(frame)
+            except Exception:
+                self.spectators.remove(spectator)
+
+
+class SessionStore(Generic[T]):
+    """Bounded LRU of sessions with idle-timeout eviction.
+
+    `max_sessions` is the memory cap: every session holds one small board,
+    so the count bounds memory. The least recently used session is dropped
+    when the store is full, and sessions idle for longer than
+    `idle_timeout` seconds are dropped on the next access.
+
+    A session someone is connected to (a listener or spectator) is in use:
+    it is never dropped, and the store may go over the cap rather than
+    pull a table out from under its players.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], T],
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        on_evict: Callable[[Session[T]], None] | None = None,
+    ):
+        self.factory = factory
+        self.on_evict = on_evict
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._sessions: "OrderedDict[str, Session[T]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._sessions
+
+    def get(self, key: str) -> Session[T]:
+        """Return the session for key, creating it if needed."""
+        self.evict_idle()
+        session = self._sessions.get(key)
+        if session is None:
+            session = Session(key, self.factory())
+            self._sessions[key] = session
+            while len(self._sessions) > self.max_sessions and self._evict_oldest(key):
+                pass
+        else:
+            self._sessions.move_to_end(key)
+        session.touch()
+        return session
+
+    def find(self, key: str) -> Session[T] | None:
+        """Return the session for key, or None; never creates one."""
+        self.evict_idle()
+        session = self._sessions.get(key)
+        if session is not None:
+            self._sessions.move_to_end(key)
+            session.touch()
+        return session
+
+    def touch(self, key: str) -> None:
+        """Mark a session as used without creating it."""
+        session = self._sessions.get(key)
+        if session is not None:
+            self._sessions.move_to_end(key)
+            session.touch()
+
+    def drop(self, key: str) -> None:
+        self._sessions.pop(key, None)
+
+    def evict_idle(self) -> int:
+        """Drop sessions idle past the timeout. Returns how many went."""
+        cutoff = time.monotonic() - self.idle_timeout
+        evicted = 0
+        # ordered oldest first, so stop at the first fresh one
+        while self._sessions:
+            key, session = next(iter(self._sessions.items()))
+            if session.last_seen >= cutoff:
+                break
+            if session.listeners or session.spectators:
+                # an open connection counts as activity
+                session.touch()
+                self._sessions.move_to_end(key)
+                continue
+            del self._sessions[key]
+            self._evicted(session)
+            evicted += 1
+        return evicted
+
+    def _evict_oldest(self, keep: str) -> bool:
+        """Drop the least recently used session, other than keep, nobody is connected to."""
+        for key, session in self._sessions.items():
+            if key != keep and not (session.listeners or session.spectators):
+                del self._sessions[key]
+                self._evicted(session)
+                return True
+        return False
+
+    def __iter__(self):
+        return iter(list(self._sessions.values()))
+
+    def _evicted(self, session: Session[T]):
+        if self.on_evict is not None:
+            self.on_evict(session)
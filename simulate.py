@@ -0,0 +1,204 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+from engine import (
+    DEFAULT_COLS,
+    DEFAULT_ROWS,
+    POINT_LIMIT,
+    ROUND_LIMIT,
+    GameState,
+    dice_and_rule_values,
+)
+from gamelog import GameLog, game_row
+from policies import POLICIES, get_policy
+
+# ----------------- Monte Carlo simulation -------------------
+#
+# Plays seeded games between two policies, split into chunks across a
+# process pool. Game i always uses seed `seed + i`, so results do not depend
+# on the number of workers.
+
+
+class Stats:
+    """Aggregate results of a batch of games; chunks merge into one."""
+
+    def __init__(self):
+        self.games = 0
+        self.wins = Counter()  # "Player 1" / "Player 2" / "tie"
+        self.win_reasons = Counter()
+        self.scores = {"Player 1": Counter(), "Player 2": Counter()}
+        self.turns = 0
+
+    def add(self, game: GameState):
+        self.games += 1
+        self.wins[game.winner or "tie"] += 1
+        self.win_reasons[game.win_reason] += 1
+        p1, p2 = game.scores()
+        self.scores["Player 1"][p1] += 1
+        self.scores["Player 2"][p2] += 1
+        self.turns += game.rounds["Player 1"] + game.rounds["Player 2"]
+
+    def merge(self, other: "Stats"):
+        self.games += other.games
+        self.wins.update(other.wins)
+        self.win_reasons.update(other.win_reasons)
+        for p in self.scores:
+            self.scores[p].update(other.scores[p])
+        self.turns += other.turns
+
+    def to_dict(self) -> dict:
+        n = self.games or 1
+
+        def mean(hist):
+            return sum(k * v for k, v in hist.items()) / n
+
+        return {
+            "games": self.games,
+            "first_player_win_rate": self.wins["Player 1"] / n,
+            "second_player_win_rate": self.wins["Player 2"] / n,
+            "tie_rate": self.wins["tie"] / n,
+            "win_reasons": dict(self.win_reasons.most_common()),
+            "mean_score": {p: mean(h) for p, h in self.scores.items()},
+            "score_distribution": {
+                p: dict(sorted(h.items())) for p, h in self.scores.items()
+            },
+            "mean_turns": self.turns / n,
+        }
+
+
+def play_game(seed: int, p1, p2, **rules) -> GameState:
+    """Play one game to the end with the given policies."""
+    game = GameState(seed=seed, **rules)
+    rng = random.Random(seed)
+    policies = {"Player 1": p1, "Player 2": p2}
+    while not game.game_over and game._can_player_act(game.player):
+        move = policies[game.player](game, rng)
+        if move is None or game.play(*move) != "placed":
+            game.pass_turn()
+    return game
+
+
+def run_chunk(args):
+    """Play one chunk; returns its Stats and, if asked for, the game log rows."""
+    start, count, p1_name, p2_name, rules, keep_rows = args
+    p1, p2 = get_policy(p1_name), get_policy(p2_name)
+    stats = Stats()
+    rows = []
+    for seed in range(start, start + count):
+        game = play_game(seed, p1, p2, **rules)
+        stats.add(game)
+        if keep_rows:
+            rows.append(game_row(game))
+    return stats, rows
+
+
+def simulate(
+    games: int,
+    p1: str = "random",
+    p2: str = "random",
+    seed: int = 0,
+    workers: int | None = None,
+    chunk: int = 2000,
+    on_progress=None,
+    game_log: GameLog | None = None,
+    **rules,
+) -> dict:
+    """Play `games` games and return the aggregate stats.
+
+    on_progress(stats, elapsed) is called after every finished chunk. With a
+    game_log, every game is also stored there.
+    """
+    get_policy(p1), get_policy(p2)  # fail fast on a bad name
+    workers = workers or os.cpu_count() or 1
+    jobs = [
+        (start, min(chunk, seed + games - start), p1, p2, rules, game_log is not None)
+        for start in range(seed, seed + games, chunk)
+    ]
+
+    total = Stats()
+    started = time.perf_counter()
+
+    def collect(results):
+        for part, rows in results:
+            total.merge(part)
+            for row in rows:
+                game_log.record_row(row)
+            if on_progress:
+                on_progress(total, time.perf_counter() - started)
+
+    if workers == 1 or len(jobs) == 1:
+        collect(map(run_chunk, jobs))
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            collect(pool.imap_unordered(run_chunk, jobs))
+
+    if game_log is not None:
+        game_log.flush()
+    elapsed = time.perf_counter() - started
+    result = total.to_dict()
+    result["seconds"] = elapsed
+    result["games_per_second"] = total.games / elapsed if elapsed else 0.0
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo game simulator")
+    parser.add_argument("-n", "--games", type=int, default=100_000)
+    parser.add_argument("--p1", default="random", choices=sorted(POLICIES))
+    parser.add_argument("--p2", default="random", choices=sorted(POLICIES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk", type=int, default=2000)
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS)
+    parser.add_argument("--cols", type=int, default=DEFAULT_COLS)
+    parser.add_argument("--point-limit", type=int, default=POINT_LIMIT)
+    parser.add_argument("--round-limit", type=int, default=ROUND_LIMIT)
+    parser.add_argument(
+        "--values", help="JSON file mapping tile text to points (default: built-in rules)"
+    )
+    parser.add_argument("--log", help="also store every game in this SQLite game log")
+    args = parser.parse_args(argv)
+
+    values = dice_and_rule_values
+    if args.values:
+        with open(args.values, "r", encoding="utf-8") as f:
+            values = json.load(f)
+
+    def progress(stats, elapsed):
+        print(
+            f"{stats.games:>10} games  "
+            f"P1 {stats.wins['Player 1'] / stats.games:6.2%}  "
+            f"{stats.games / elapsed:,.0f} games/s",
+            file=sys.stderr,
+        )
+
+    game_log = GameLog(args.log) if args.log else None
+    result = simulate(
+        args.games,
+        p1=args.p1,
+        p2=args.p2,
+        seed=args.seed,
+        workers=args.workers,
+        chunk=args.chunk,
+        on_progress=progress,
+        rows=args.rows,
+        cols=args.cols,
+        values=values,
+        point_limit=args.point_limit,
+        round_limit=args.round_limit,
+        game_log=game_log,
+    )
+    if game_log is not None:
+        game_log.close()
+    json.dump(result, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
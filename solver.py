@@ -0,0 +1,434 @@
+import argparse
+import bisect
+import hashlib
+import json
+import mmap
+import multiprocessing
+import os
+import sys
+import time
+from array import array
+from functools import lru_cache
+
+from bitboard import geometry
+from engine import GameState
+
+# ----------------- Endgame solver ---------------------------
+#
+# Exact game values for small boards: P1_WINS, TIE or P2_WINS under perfect
+# play. Moves are a placement on a free cell or a pass (removing a tile is
+# never needed, as in the search bot). Values are proven by a memoized
+# alpha-beta over the three results: a side stops looking as soon as it has
+# found a win, and a cell that completes a line is taken without searching
+# further. Every stored value is exact.
+#
+# Positions are keyed by both ownership masks, the rounds, the side to move
+# and the pending last turn; scores follow from the masks. Boards that look
+# the same after one of the 8 symmetries (4 for non-square boards) share
+# a key, when the tile values are symmetric under it.
+#
+# build_table() solves every position in the first plies on a process pool
+# and writes all proven values to a sorted, memory-mapped table. The UI
+# answers from it with a binary search. Positions outside the table are
+# solved on demand by solve_position().
+
+P1_WINS, TIE, P2_WINS = 1, 0, -1
+MAX_CELLS = 25  # the packed key must fit in 64 bits
+DEFAULT_DIR = "solutions"
+MAGIC = b"PKSV"
+VERSION = 2  # 2: canonical keys are the orbit minimum
+_HEADER = 16  # magic, version, padding, entry count; keeps the keys 8-aligned
+
+PENDING_CODES = {None: 0, "Player 1": 1, "Player 2": 2}
+
+
+class Rules:
+    """Everything about one grid and rule set the solver needs."""
+
+    __slots__ = (
+        "rows",
+        "cols",
+        "size",
+        "points",
+        "neighbours",
+        "lines_through",
+        "point_limit",
+        "round_limit",
+        "symmetries",
+        "digest",
+        "_perm_tables",
+    )
+
+    def __init__(self, grid, values, point_limit, round_limit):
+        rows, cols = len(grid), len(grid[0])
+        if rows * cols > MAX_CELLS:
+            raise ValueError(f"boards over {MAX_CELLS} cells are too big to solve")
+        if round_limit > 15:
+            raise ValueError("rounds are packed in 4 bits")
+        self.rows, self.cols, self.size = rows, cols, rows * cols
+        self.points = tuple(values.get(v, 0) for row in grid for v in row)
+        self.point_limit = point_limit
+        self.round_limit = round_limit
+        self.lines_through = geometry(rows, cols).lines_through
+
+        neighbours = []
+        for r in range(rows):
+            for c in range(cols):
+                mask = 0
+                for dr in (-1, 0, 1):
+                    for dc in (-1, 0, 1):
+                        nr, nc = r + dr, c + dc
+                        if (dr or dc) and 0 <= nr < rows and 0 <= nc < cols:
+                            mask |= 1 << (nr * cols + nc)
+                neighbours.append(mask)
+        self.neighbours = tuple(neighbours)
+
+        # only symmetries that map every tile onto one worth the same
+        self.symmetries = [
+            perm
+            for perm in _cell_symmetries(rows, cols)
+            if all(self.points[perm[i]] == self.points[i] for i in range(self.size))
+        ]
+        self._perm_tables = [_perm_table(perm) for perm in self.symmetries[1:]]
+
+        # the version is part of the name, so tables with older keys are not opened
+        spec = json.dumps([VERSION, self.points, rows, cols, point_limit, round_limit])
+        self.digest = hashlib.sha1(spec.encode()).hexdigest()[:16]
+
+    @classmethod
+    def from_game(cls, game: GameState) -> "Rules":
+        return cls(game.grid, game.values, game.point_limit, game.round_limit)
+
+    def spec(self):
+        """Picklable arguments that rebuild these rules in a worker."""
+        grid = [list(self.points[r * self.cols:(r + 1) * self.cols]) for r in range(self.rows)]
+        values = {p: p for row in grid for p in row}
+        return grid, values, self.point_limit, self.round_limit
+
+    def key(self, state) -> int:
+        """Packed, symmetry-canonical key of a state."""
+        m1, m2, r1, r2, player, pending = state[:6]
+        n = self.size
+        best = (m1, m2)
+        for tables in self._perm_tables:
+            # each symmetry maps the state itself, not the smallest image so far
+            image = (_permute(m1, tables), _permute(m2, tables))
+            if image < best:
+                best = image
+        m1, m2 = best
+        return m1 | m2 << n | r1 << 2 * n | r2 << 2 * n + 4 | player << 2 * n + 8 | pending << 2 * n + 9
+
+
+def rules_for(game: GameState) -> Rules:
+    """Rules.from_game, cached per board and limits."""
+    points = tuple(tuple(game.values.get(v, 0) for v in row) for row in game.grid)
+    return _rules(points, game.point_limit, game.round_limit)
+
+
+@lru_cache(maxsize=64)
+def _rules(points, point_limit, round_limit) -> Rules:
+    return Rules(points, {p: p for row in points for p in row}, point_limit, round_limit)
+
+
+def _cell_symmetries(rows: int, cols: int):
+    """Cell permutations of the board's symmetries, identity first."""
+    maps = [
+        lambda r, c: (r, c),
+        lambda r, c: (r, cols - 1 - c),
+        lambda r, c: (rows - 1 - r, c),
+        lambda r, c: (rows - 1 - r, cols - 1 - c),
+    ]
+    if rows == cols:
+        maps += [
+            lambda r, c: (c, r),
+            lambda r, c: (cols - 1 - c, rows - 1 - r),
+            lambda r, c: (c, rows - 1 - r),
+            lambda r, c: (cols - 1 - c, r),
+        ]
+    return [
+        tuple(nr * cols + nc for nr, nc in (f(i // cols, i % cols) for i in range(rows * cols)))
+        for f in maps
+    ]
+
+
+def _perm_table(perm):
+    """Per-byte lookup tables that move bit i of a mask to bit perm[i]."""
+    tables = []
+    for base in range(0, len(perm), 8):
+        table = []
+        for byte in range(256):
+            out = 0
+            for k in range(8):
+                if byte >> k & 1 and base + k < len(perm):
+                    out |= 1 << perm[base + k]
+            table.append(out)
+        tables.append(table)
+    return tables
+
+
+def _permute(mask: int, tables) -> int:
+    out = 0
+    for table in tables:
+        out |= table[mask & 0xFF]
+        mask >>= 8
+    return out
+
+
+# ----------------- States -----------------------------------
+#
+# A state is (m1, m2, rounds_p1, rounds_p2, player, pending, score_p1,
+# score_p2) with player 0/1 and pending 0 (none), 1 or 2.
+
+
+def state_of(game: GameState):
+    m1 = m2 = 0
+    bit = 1
+    for row in game.owner:
+        for cell in row:
+            if cell == "Player 1":
+                m1 |= bit
+            elif cell == "Player 2":
+                m2 |= bit
+            bit <<= 1
+    s1, s2 = game.scores()
+    return (
+        m1,
+        m2,
+        game.rounds["Player 1"],
+        game.rounds["Player 2"],
+        0 if game.player == "Player 1" else 1,
+        PENDING_CODES[game.pending_last_turn_for],
+        s1,
+        s2,
+    )
+
+
+def children(rules: Rules, state):
+    """Yield (cell or None for a pass, result or None, next state or None).
+
+    result is set when the move ends the game, mirroring
+    GameState._after_turn.
+    """
+    m1, m2, r1, r2, player, pending, s1, s2 = state
+    occupied = m1 | m2
+    cells = [i for i in range(rules.size) if not occupied >> i & 1]
+    for cell in cells + [None]:
+        a, b, ra, rb, sa, sb = m1, m2, r1, r2, s1, s2
+        if cell is not None:
+            bit = 1 << cell
+            mine = a if player == 0 else b
+            gain = rules.points[cell] + (mine & rules.neighbours[cell]).bit_count()
+            mine |= bit
+            if any(mine & line == line for line in rules.lines_through[cell]):
+                yield cell, (P1_WINS if player == 0 else P2_WINS), None
+                continue
+            if player == 0:
+                a, ra, sa = mine, ra + 1, sa + gain
+            else:
+                b, rb, sb = mine, rb + 1, sb + gain
+        elif player == 0:
+            ra += 1
+        else:
+            rb += 1
+        yield cell, *_after_move(rules, a, b, ra, rb, player, pending, sa, sb)
+
+
+def _after_move(rules, a, b, ra, rb, player, pending, sa, sb):
+    if pending:
+        if pending - 1 == player:
+            return (sa > sb) - (sa < sb), None
+    elif sa >= rules.point_limit or sb >= rules.point_limit:
+        pending = 2 - player  # the other player's code
+    if ra >= rules.round_limit and rb >= rules.round_limit:
+        return (sa > sb) - (sa < sb), None
+    nxt = pending - 1 if pending else 1 - player
+    return None, (a, b, ra, rb, nxt, pending, sa, sb)
+
+
+class Solver:
+    """Memoized perfect-play values for one Rules."""
+
+    def __init__(self, rules: Rules, memo: dict | None = None):
+        self.rules = rules
+        self.memo = memo if memo is not None else {}
+
+    def value(self, state) -> int:
+        rules = self.rules
+        key = rules.key(state)
+        known = self.memo.get(key)
+        if known is not None:
+            return known
+
+        m1, m2, r1, r2, player, pending, s1, s2 = state
+        mine = m1 if player == 0 else m2
+        target = P1_WINS if player == 0 else P2_WINS
+        occupied = m1 | m2
+
+        # a cell that completes a line wins outright; otherwise try the
+        # richest cells first and passing last
+        ordered = []
+        for cell in range(rules.size):
+            if occupied >> cell & 1:
+                continue
+            claimed = mine | 1 << cell
+            if any(claimed & line == line for line in rules.lines_through[cell]):
+                self.memo[key] = target
+                return target
+            gain = rules.points[cell] + (mine & rules.neighbours[cell]).bit_count()
+            ordered.append((gain, cell))
+        ordered.sort(reverse=True)
+        ordered.append((0, None))
+
+        best = -target
+        first = True
+        for gain, cell in ordered:
+            a, b, ra, rb, sa, sb = m1, m2, r1, r2, s1, s2
+            if cell is not None:
+                if player == 0:
+                    a, sa = a | 1 << cell, sa + gain
+                else:
+                    b, sb = b | 1 << cell, sb + gain
+            if player == 0:
+                ra += 1
+            else:
+                rb += 1
+            result, child = _after_move(rules, a, b, ra, rb, player, pending, sa, sb)
+            if result is None:
+                result = self.value(child)
+            if first or result * target > best * target:
+                best, first = result, False
+            if best == target:
+                break
+        self.memo[key] = best
+        return best
+
+
+def solve_position(spec, state) -> int:
+    """Value of one state; picklable for run.cpu_bound."""
+    return Solver(Rules(*spec)).value(state)
+
+
+# ----------------- Tables -----------------------------------
+
+
+def table_path(rules: Rules, directory: str = DEFAULT_DIR) -> str:
+    return os.path.join(directory, f"{rules.rows}x{rules.cols}-{rules.digest}.pks")
+
+
+def _solve_chunk(args):
+    spec, states = args
+    solver = Solver(Rules(*spec))
+    for state in states:
+        solver.value(state)
+    return solver.memo
+
+
+def build_table(rules: Rules, path: str, plies: int = 2, workers: int | None = None) -> dict:
+    """Solve every position in the first `plies` plies and save all values.
+
+    The frontier positions are split across a process pool; each worker
+    returns its proven values and the parent merges them, solves the top
+    plies from the merged values and writes the table.
+    """
+    started = time.perf_counter()
+    root = (0, 0, 0, 0, 0, 0, 0, 0)
+    frontier, seen = [root], {rules.key(root)}
+    for _ in range(plies):
+        level = []
+        for state in frontier:
+            for _, _, child in children(rules, state):
+                if child is not None and rules.key(child) not in seen:
+                    seen.add(rules.key(child))
+                    level.append(child)
+        frontier = level
+
+    workers = workers or os.cpu_count() or 1
+    chunks = [(rules.spec(), frontier[i::workers]) for i in range(workers)]
+    memo = {}
+    if workers == 1:
+        results = map(_solve_chunk, chunks)
+    else:
+        pool = multiprocessing.Pool(workers)
+        results = pool.imap_unordered(_solve_chunk, chunks)
+    for part in results:
+        memo.update(part)
+    if workers != 1:
+        pool.close()
+        pool.join()
+
+    value = Solver(rules, memo).value(root)
+    write_table(path, memo)
+    return {
+        "value": value,
+        "positions": len(memo),
+        "frontier": len(frontier),
+        "symmetries": len(rules.symmetries),
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def write_table(path: str, memo: dict):
+    """Sorted uint64 keys, then one byte per value (value + 1)."""
+    keys = array("Q", sorted(memo))
+    values = bytes(memo[k] + 1 for k in keys)
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + bytes([VERSION]) + bytes(3) + len(keys).to_bytes(8, "little"))
+        keys.tofile(f)
+        f.write(values)
+    os.replace(tmp, path)
+
+
+class Table:
+    """Read-only, memory-mapped solver table (native byte order)."""
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:4] != MAGIC or self._map[4] != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a solver table")
+        count = int.from_bytes(self._map[8:16], "little")
+        self.keys = memoryview(self._map)[_HEADER:_HEADER + 8 * count].cast("Q")
+        self.values = memoryview(self._map)[_HEADER + 8 * count:_HEADER + 9 * count]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def get(self, key: int):
+        i = bisect.bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return self.values[i] - 1
+        return None
+
+    def close(self):
+        for view in ("keys", "values"):
+            if hasattr(self, view):
+                getattr(self, view).release()
+        self._map.close()
+        self._file.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a perfect-play table for one board")
+    parser.add_argument("--seed", type=int, required=True, help="GameState seed of the board")
+    parser.add_argument("--rows", type=int, default=4)
+    parser.add_argument("--cols", type=int, default=4)
+    parser.add_argument("--plies", type=int, default=2, help="plies expanded before splitting")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--dir", default=DEFAULT_DIR)
+    args = parser.parse_args(argv)
+
+    game = GameState(args.rows, args.cols, seed=args.seed)
+    rules = Rules.from_game(game)
+    path = table_path(rules, args.dir)
+    result = build_table(rules, path, args.plies, args.workers)
+    result["path"] = path
+    json.dump(result, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
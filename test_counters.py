@@ -0,0 +1,60 @@
+import random
+
+import pytest
+
+from engine import GameState, count_tiles, count_total_points
+
+# ----------------- Incremental counters ---------------------
+#
+# GameState keeps scores and tile counts up to date move by move; after any
+# sequence of moves they must equal a full recount of the board.
+
+
+def assert_counters(game: GameState):
+    assert game.scores() == count_total_points(game.grid, game.owner, game.values)
+    tiles = (game.tile_counts["Player 1"], game.tile_counts["Player 2"])
+    assert tiles == count_tiles(game.owner)
+
+
+def random_step(game: GameState, rng: random.Random):
+    x = rng.random()
+    if x < 0.55:
+        game.play(rng.randrange(game.rows), rng.randrange(game.cols))
+    elif x < 0.65:
+        # a cell of the player to move: play() takes it back
+        own = [
+            (r, c)
+            for r in range(game.rows)
+            for c in range(game.cols)
+            if game.owner[r][c] == game.player
+        ]
+        if own:
+            game.play(*rng.choice(own))
+    elif x < 0.75:
+        game.pass_turn()
+    elif x < 0.9:
+        game.undo_last()
+    else:
+        game.redo()
+
+
+@pytest.mark.parametrize("rows, cols", [(4, 4), (3, 5), (6, 6)])
+def test_counters_match_recount(rows, cols):
+    rng = random.Random(rows * 100 + cols)
+    for _ in range(300):
+        game = GameState(rows, cols, seed=rng.randrange(2**32))
+        for _ in range(60):
+            random_step(game, rng)
+            assert_counters(game)
+
+
+def test_counters_after_undoing_everything():
+    rng = random.Random(7)
+    game = GameState(seed=7)
+    for _ in range(40):
+        random_step(game, rng)
+    while game.history:
+        game.undo_last()
+        assert_counters(game)
+    assert game.scores() == (0, 0)
+    assert count_tiles(game.owner) == (0, 0)
@@ -0,0 +1,353 @@
+import argparse
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+from engine import DEFAULT_COLS, DEFAULT_ROWS, POINT_LIMIT, ROUND_LIMIT
+from policies import POLICIES, get_policy
+from simulate import play_game
+
+# ----------------- Tournament -------------------------------
+#
+# Pits move policies against each other on seeded boards. Every board is
+# played twice with the sides swapped, so both policies get the first move
+# on it. Matches run on a process pool, and each finished game is appended
+# to a JSON lines file right away. Re-running with the same file and
+# settings skips the games already in it, so a long run can resume after an
+# interruption.
+#
+# Ratings are Elo from a Bradley-Terry fit over all games, with a tie worth
+# half a win. Confidence intervals come from a bootstrap over each pairing's
+# games.
+
+RESULTS_FILE = "tournament.jsonl"
+ELO_BASE = 1500
+
+
+# ----------------- Matches ----------------------------------
+
+
+def play_match(args):
+    """One pairing over a range of boards; returns a result row per game."""
+    a, b, seeds, rules = args
+    policies = {a: get_policy(a), b: get_policy(b)}
+    rows = []
+    for seed in seeds:
+        for p1, p2 in ((a, b), (b, a)):
+            game = play_game(seed, policies[p1], policies[p2], **rules)
+            score = {"Player 1": 1.0, "Player 2": 0.0, None: 0.5}[game.winner]
+            rows.append(
+                {
+                    "p1": p1,
+                    "p2": p2,
+                    "seed": seed,
+                    "score": score,  # for p1
+                    "reason": game.win_reason,
+                    "points": list(game.scores()),
+                }
+            )
+    return rows
+
+
+class ResultsFile:
+    """Append-only game results, headed by the settings they were played with."""
+
+    def __init__(self, path: str, settings: dict):
+        self.path = path
+        self.games = []
+        if os.path.exists(path):
+            lines = self._read(path)
+            if lines and lines[0].get("settings") != settings:
+                raise SystemExit(
+                    f"{path} was played with other settings; use another --results file"
+                )
+            self.games = lines[1:]
+        self._file = open(path, "a", encoding="utf-8")
+        if not os.path.getsize(path):
+            self._write({"settings": settings})
+
+    @staticmethod
+    def _read(path: str) -> list:
+        """Rows of the file; a last line torn by an interrupted write is cut off."""
+        with open(path, "rb") as f:
+            data = f.read()
+        rows, good = [], 0
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break  # only a killed run leaves a line without its newline
+            if line.strip():
+                rows.append(json.loads(line))
+            good += len(line)
+        if good < len(data):
+            with open(path, "r+b") as f:
+                f.truncate(good)
+        return rows
+
+    def _write(self, row: dict):
+        self._file.write(json.dumps(row) + "\n")
+        self._file.flush()
+
+    def add(self, rows):
+        for row in rows:
+            self._write(row)
+        self.games.extend(rows)
+
+    def done(self) -> set:
+        return {(g["p1"], g["p2"], g["seed"]) for g in self.games}
+
+    def close(self):
+        self._file.close()
+
+
+def run_matches(pairings, results: ResultsFile, rules: dict, workers: int, chunk: int,
+                on_progress=None):
+    """Play every (a, b, seeds) pairing not yet in results."""
+    done = results.done()
+    jobs = []
+    for a, b, seeds in pairings:
+        todo = [s for s in seeds if (a, b, s) not in done or (b, a, s) not in done]
+        for i in range(0, len(todo), chunk):
+            jobs.append((a, b, todo[i:i + chunk], rules))
+    if not jobs:
+        return
+    if workers == 1 or len(jobs) == 1:
+        finished = map(play_match, jobs)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(workers)
+        finished = pool.imap_unordered(play_match, jobs)
+    try:
+        for rows in finished:
+            # a half-played mirror from an interrupted run is played again
+            results.add([r for r in rows if (r["p1"], r["p2"], r["seed"]) not in done])
+            if on_progress:
+                on_progress(len(results.games))
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+
+# ----------------- Formats ----------------------------------
+
+
+def round_robin(players, games: int, seed: int):
+    seeds = range(seed, seed + games)
+    return [(a, b, seeds) for a, b in itertools.combinations(players, 2)]
+
+
+def match_points(games, round_seeds) -> dict:
+    """Tournament points per player from the games on round_seeds: 1 per match won."""
+    totals = defaultdict(lambda: defaultdict(float))  # (a, b) -> player -> score
+    for g in games:
+        if g["seed"] not in round_seeds:
+            continue
+        pair = tuple(sorted((g["p1"], g["p2"])))
+        totals[pair][g["p1"]] += g["score"]
+        totals[pair][g["p2"]] += 1 - g["score"]
+    points = defaultdict(float)
+    for (a, b), score in totals.items():
+        if score[a] > score[b]:
+            points[a] += 1
+        elif score[b] > score[a]:
+            points[b] += 1
+        else:
+            points[a] += 0.5
+            points[b] += 0.5
+    return points
+
+
+def swiss_pairings(players, standings: dict, played: set):
+    """Pair neighbours in the standings, avoiding rematches when possible."""
+    order = sorted(players, key=lambda p: (-standings.get(p, 0), players.index(p)))
+    pairs = []
+    while len(order) > 1:
+        a = order.pop(0)
+        b = next((p for p in order if frozenset((a, p)) not in played), order[0])
+        order.remove(b)
+        pairs.append((a, b))
+    return pairs  # an odd player out sits the round out
+
+
+def run_swiss(players, rounds: int, games: int, seed: int, results: ResultsFile,
+              rules: dict, workers: int, chunk: int, on_progress=None):
+    standings = defaultdict(float)
+    played = set()
+    for n in range(rounds):
+        # each round plays fresh boards; pairings follow from earlier rounds only
+        seeds = range(seed + n * games, seed + (n + 1) * games)
+        pairs = swiss_pairings(players, standings, played)
+        run_matches([(a, b, seeds) for a, b in pairs], results, rules, workers, chunk, on_progress)
+        for p, pts in match_points(results.games, set(seeds)).items():
+            standings[p] += pts
+        played.update(frozenset(pair) for pair in pairs)
+    return {p: standings[p] for p in players}
+
+
+# ----------------- Ratings ----------------------------------
+
+
+def pair_scores(games) -> dict:
+    """(a, b) with a < b -> list of a's score in each game."""
+    scores = defaultdict(list)
+    for g in games:
+        a, b = sorted((g["p1"], g["p2"]))
+        scores[(a, b)].append(g["score"] if g["p1"] == a else 1 - g["score"])
+    return scores
+
+
+def fit_elo(players, totals: dict, iterations: int = 1000) -> dict:
+    """Bradley-Terry fit (MM updates) of (a, b) -> (a's score, games).
+
+    One virtual draw per pairing keeps unbeaten or winless players finite.
+    """
+    won = {p: 0.0 for p in players}
+    games = defaultdict(float)
+    for (a, b), (score, n) in totals.items():
+        won[a] += score + 0.5
+        won[b] += n - score + 0.5
+        games[(a, b)] = games[(b, a)] = n + 1
+    strength = {p: 1.0 for p in players}
+    for _ in range(iterations):
+        new = {}
+        for p in players:
+            denom = sum(
+                games[(p, q)] / (strength[p] + strength[q])
+                for q in players
+                if q != p and games[(p, q)]
+            )
+            new[p] = won[p] / denom if denom else strength[p]
+        scale = math.exp(sum(math.log(v) for v in new.values()) / len(new))
+        new = {p: v / scale for p, v in new.items()}
+        converged = all(abs(new[p] - strength[p]) < 1e-10 for p in players)
+        strength = new
+        if converged:
+            break
+    return {p: ELO_BASE + 400 * math.log10(strength[p]) for p in players}
+
+
+def elo_ratings(players, games, bootstrap: int = 200, seed: int = 0) -> dict:
+    """Elo per player with a 95% bootstrap interval, plus games and score."""
+    scores = pair_scores(games)
+    totals = {pair: (sum(s), len(s)) for pair, s in scores.items()}
+    elo = fit_elo(players, totals)
+
+    rng = random.Random(seed)
+    samples = {p: [] for p in players}
+    for _ in range(bootstrap):
+        resampled = {}
+        for pair, s in scores.items():
+            draw = rng.choices(s, k=len(s))
+            resampled[pair] = (sum(draw), len(draw))
+        for p, rating in fit_elo(players, resampled, iterations=200).items():
+            samples[p].append(rating)
+
+    played = defaultdict(int)
+    points = defaultdict(float)
+    for (a, b), (score, n) in totals.items():
+        played[a] += n
+        played[b] += n
+        points[a] += score
+        points[b] += n - score
+
+    ratings = {}
+    for p in players:
+        s = sorted(samples[p])
+        low, high = (s[int(0.025 * len(s))], s[int(0.975 * len(s)) - 1]) if s else (elo[p], elo[p])
+        ratings[p] = {
+            "elo": elo[p],
+            "ci95": [low, high],
+            "games": played[p],
+            "score": points[p] / played[p] if played[p] else 0.0,
+        }
+    return dict(sorted(ratings.items(), key=lambda item: -item[1]["elo"]))
+
+
+# ----------------- CLI --------------------------------------
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tournament between move policies")
+    parser.add_argument("--policies", nargs="+", default=list(POLICIES), choices=list(POLICIES))
+    parser.add_argument("--format", choices=("round-robin", "swiss"), default="round-robin")
+    parser.add_argument("--rounds", type=int, default=3, help="swiss rounds")
+    parser.add_argument("-n", "--games", type=int, default=100, help="boards per pairing, each played twice")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="default: all CPUs")
+    parser.add_argument("--chunk", type=int, default=10, help="boards per worker job")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS)
+    parser.add_argument("--cols", type=int, default=DEFAULT_COLS)
+    parser.add_argument("--point-limit", type=int, default=POINT_LIMIT)
+    parser.add_argument("--round-limit", type=int, default=ROUND_LIMIT)
+    parser.add_argument("--bootstrap", type=int, default=200, help="resamples for the intervals")
+    parser.add_argument("--results", default=RESULTS_FILE, help="JSON lines file; resumed if it exists")
+    args = parser.parse_args(argv)
+
+    players = list(dict.fromkeys(args.policies))
+    if len(players) < 2:
+        parser.error("need at least two policies")
+    rules = {
+        "rows": args.rows,
+        "cols": args.cols,
+        "point_limit": args.point_limit,
+        "round_limit": args.round_limit,
+    }
+    settings = {
+        "policies": players,
+        "format": args.format,
+        "rounds": args.rounds if args.format == "swiss" else None,
+        "games": args.games,
+        "seed": args.seed,
+        "rules": rules,
+    }
+    workers = args.workers or os.cpu_count() or 1
+    results = ResultsFile(args.results, settings)
+    resumed = len(results.games)
+    started = time.perf_counter()
+
+    def progress(total):
+        rate = (total - resumed) / (time.perf_counter() - started)
+        print(f"\r{total} games ({rate:,.1f}/s)", end="", file=sys.stderr, flush=True)
+
+    try:
+        if args.format == "round-robin":
+            run_matches(
+                round_robin(players, args.games, args.seed),
+                results, rules, workers, args.chunk, progress,
+            )
+            standings = None
+        else:
+            standings = run_swiss(
+                players, args.rounds, args.games, args.seed,
+                results, rules, workers, args.chunk, progress,
+            )
+    except KeyboardInterrupt:
+        print(f"\ninterrupted; {len(results.games)} games saved to {args.results}", file=sys.stderr)
+        raise SystemExit(130)
+    finally:
+        results.close()
+    print(file=sys.stderr)
+
+    ratings = elo_ratings(players, results.games, args.bootstrap, args.seed)
+    for rank, (p, r) in enumerate(ratings.items(), 1):
+        low, high = r["ci95"]
+        print(
+            f"{rank}. {p:<10} {r['elo']:7.1f}  [{low:7.1f}, {high:7.1f}]  "
+            f"{r['games']} games, {r['score']:.1%} score",
+            file=sys.stderr,
+        )
+    summary = {"games": len(results.games), "ratings": ratings}
+    if standings is not None:
+        summary["swiss_points"] = standings
+    json.dump(summary, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import numpy as np
+
+from engine import LINE_LENGTH, dice_and_rule_values
+
+# ----------------- NumPy scoring for large boards -----------
+#
+# Whole-board scoring and line detection with array shifts instead of
+# Python loops. Used for analysis of large boards (50x50 and up); a live
+# GameState keeps its own incremental counters and does not need this.
+#
+# Ownership is an int8 array: 0 = free, 1 = Player 1, 2 = Player 2.
+
+PLAYER_CODES = {"Player 1": 1, "Player 2": 2}
+
+
+def owner_array(owner_matrix) -> np.ndarray:
+    return np.array(
+        [[PLAYER_CODES.get(cell, 0) for cell in row] for row in owner_matrix],
+        dtype=np.int8,
+    )
+
+
+def points_array(grid, values: dict = dice_and_rule_values) -> np.ndarray:
+    return np.array([[values.get(v, 0) for v in row] for row in grid], dtype=np.int32)
+
+
+def adjacency_pairs(mask: np.ndarray) -> int:
+    """8-neighbour pairs inside a boolean mask."""
+    return int(
+        np.count_nonzero(mask[:, :-1] & mask[:, 1:])
+        + np.count_nonzero(mask[:-1, :] & mask[1:, :])
+        + np.count_nonzero(mask[:-1, :-1] & mask[1:, 1:])
+        + np.count_nonzero(mask[:-1, 1:] & mask[1:, :-1])
+    )
+
+
+def scores(points: np.ndarray, owner: np.ndarray):
+    """(score_p1, score_p2), same as engine.count_total_points."""
+    result = []
+    for code in (1, 2):
+        mask = owner == code
+        result.append(int(points[mask].sum()) + adjacency_pairs(mask))
+    return tuple(result)
+
+
+def _runs(mask: np.ndarray, dr: int, dc: int, length: int) -> np.ndarray:
+    """True where a full run of `length` starts in direction (dr, dc).
+
+    This is a sliding AND, i.e. a convolution with a ones kernel tested
+    against `length`, done with array slices.
+    """
+    rows, cols = mask.shape
+    span_r = (length - 1) * abs(dr)
+    span_c = (length - 1) * abs(dc)
+    if span_r >= rows or span_c >= cols:
+        return np.zeros((0, 0), dtype=bool)
+    out_r, out_c = rows - span_r, cols - span_c
+    col0 = span_c if dc < 0 else 0
+    hit = np.ones((out_r, out_c), dtype=bool)
+    for k in range(length):
+        r0 = k * dr
+        c0 = col0 + k * dc
+        hit &= mask[r0:r0 + out_r, c0:c0 + out_c]
+    return hit
+
+
+def has_line(mask: np.ndarray, length: int = LINE_LENGTH) -> bool:
+    for dr, dc in ((1, 0), (0, 1), (1, 1), (1, -1)):
+        if _runs(mask, dr, dc, length).any():
+            return True
+    return False
+
+
+def line_winner(owner: np.ndarray, length: int = LINE_LENGTH):
+    """Like GameState._check_four_winner: the only player with a line, else None."""
+    p1 = has_line(owner == 1, length)
+    p2 = has_line(owner == 2, length)
+    if p1 != p2:
+        return "Player 1" if p1 else "Player 2"
+    return None